@@ -0,0 +1,384 @@
+"""
+Offline benchmark for lambda_handler.
+
+Runs the handler in-process against local stand-ins, with no network:
+a deterministic fake embedder (hashed bag-of-words vectors) and an in-memory
+Qdrant (QdrantClient(":memory:")) loaded with chunks from a sample of
+manual/data/extracted_10k. Articles are TRUMP_TARIFF_EVENT plus synthetic
+news-style articles assembled from 10-K companies that are not in the index.
+
+Each request mode (single, grouped, chunked, filtered, batch) is measured
+in-process along each cache path of a warm container:
+    cache_cold  caches empty and collection version unread (clients and
+                modules stay loaded, so this is not a cold start)
+    miss        article not seen before (embed + search)
+    embed_hit   embedding cached, result not (search only)
+    result_hit  same request again (served from the result cache)
+
+Reported per scenario: p50/p95/p99 latency, throughput and peak allocation
+per request (tracemalloc, measured in a separate pass so tracing does not
+skew the timings).
+
+A true cold start is measured separately, as in benchmark_startup.py: in a
+fresh interpreter per run, module import, initialise_clients (SDK mode, with
+placeholder credentials; no request is sent) and initialise_local_index are
+timed, then the first request of each mode against the stand-ins (median of
+--cold-runs). Results can be written to JSON and compared against a
+previous run.
+
+Usage:
+    python benchmark_handler.py [--files 20] [--iterations 50] [--embed-ms 0] [--cold-runs 3]
+                                [--output handler.json] [--baseline old.json]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+from pathlib import Path
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, Filter, PointStruct, SearchRequest, VectorParams
+
+import lambda_function as lf
+from cache import ResultCache
+from query_chunking import create_chunks, normalize_text, split_paragraphs
+from test_events import TRUMP_TARIFF_EVENT
+
+LAMBDA_DIR = Path(__file__).parent
+EXTRACTED_DIR = LAMBDA_DIR.parent / "manual" / "data" / "extracted_10k"
+DIM = 1024  # voyage-finance-2 dimension
+BATCH_ARTICLES = 8
+MODES = ["single", "grouped", "chunked", "filtered", "batch"]
+PATHS = ["cache_cold", "miss", "embed_hit", "result_hit"]
+COLD_START_STAGES = ["import", "initialise_clients", "initialise_local_index", "first_request"]
+ALLOCATION_ITERATIONS = 20
+REGRESSION_THRESHOLD = 1.25  # Flag anything 25% slower than the baseline
+
+
+class FakeEmbedder:
+    """
+    Stand-in for voyageai.Client: hashed bag-of-words vectors, deterministic
+    and cheap, so related texts still land near each other. embed_ms adds a
+    fixed per-call delay to model the API round trip.
+    """
+
+    def __init__(self, dim=DIM, embed_ms=0.0):
+        self.dim = dim
+        self.embed_ms = embed_ms
+
+    def vector(self, text):
+        words = re.findall(r"[a-z]{3,}", text.lower())
+        buckets = [zlib.crc32(word.encode()) % self.dim for word in words] or [0]
+        vector = np.bincount(buckets, minlength=self.dim).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed(self, texts, model=None, input_type=None):
+        if self.embed_ms:
+            time.sleep(self.embed_ms / 1000)
+        return type("EmbeddingsObject", (), {
+            "embeddings": [self.vector(text) for text in texts],
+            "total_tokens": sum(len(text) // 4 for text in texts),
+        })
+
+
+def corpus_files():
+    return sorted(glob.glob(str(EXTRACTED_DIR / "*.json")))
+
+
+def section_chunks(text):
+    return create_chunks(split_paragraphs(normalize_text(text)))
+
+
+def load_index(files, embedder):
+    """In-memory Qdrant holding the chunked sections of the indexed files"""
+    qdrant = QdrantClient(":memory:")
+    qdrant.create_collection(lf.COLLECTION_NAME, vectors_config=VectorParams(size=embedder.dim, distance=Distance.COSINE))
+    qdrant.create_collection(lf.META_COLLECTION_NAME, vectors_config={})
+
+    points = []
+    for json_file in files:
+        with open(json_file, "r") as f:
+            data = json.load(f)
+        for section, content in data["sections"].items():
+            if not content.get("text"):
+                continue
+            for i, chunk in enumerate(section_chunks(content["text"])):
+                chunk_id = f"{data['ticker']}_{section}_{data['fiscal_year']}_chunk_{i}"
+                points.append(PointStruct(
+                    id=int(hashlib.md5(chunk_id.encode()).hexdigest(), 16) % (2**63),
+                    vector=embedder.vector(chunk),
+                    payload={
+                        "ticker": data["ticker"], "company_name": data["company_name"],
+                        "cik": data["cik"], "section": section, "filing_date": data["filing_date"],
+                        "fiscal_year": data["fiscal_year"], "industry": data.get("industry"),
+                        "sic_code": data.get("sic_code"), "chunk_id": chunk_id, "text": chunk,
+                    },
+                ))
+
+    for start in range(0, len(points), 256):
+        qdrant.upsert(lf.COLLECTION_NAME, points=points[start:start + 256])
+    return qdrant, len(points)
+
+
+def load_articles(files, count):
+    """TRUMP_TARIFF_EVENT plus articles built from risk factors of companies outside the index"""
+    articles = [json.loads(TRUMP_TARIFF_EVENT["body"])]
+    for json_file in files:
+        if len(articles) >= count:
+            break
+        with open(json_file, "r") as f:
+            data = json.load(f)
+        text = (data["sections"].get("item1a") or {}).get("text")
+        if not text:
+            continue
+        paragraphs = split_paragraphs(normalize_text(text))
+        articles.append({
+            "title": f"{data['company_name']} flags new risks",
+            "content": "\n\n".join(paragraphs[:6]),
+        })
+    return articles
+
+
+def build_request(mode, articles, i, nonce=None):
+    """Request body i for a mode; a nonce makes the content unseen by every cache"""
+    def article(k):
+        body = dict(articles[k % len(articles)])
+        if nonce is not None:
+            body["content"] = f"{body['content']}\n\nRef {nonce}-{k}."
+        return body
+
+    if mode == "batch":
+        return {"articles": [article(i * BATCH_ARTICLES + k) for k in range(BATCH_ARTICLES)]}
+    body = article(i)
+    if mode == "grouped":
+        body["group_by"] = "ticker"
+    elif mode == "chunked":
+        body["query_mode"] = "chunked"
+    elif mode == "filtered":
+        body["filters"] = {"section": "item1a"}
+    return body
+
+
+def reset_container(qdrant, embedder):
+    """Empty caches and an unread version marker, with the stand-in clients injected"""
+    lf.vo_client, lf.qdrant_client = embedder, qdrant
+    lf.SearchRequest, lf.QueryFilter = SearchRequest, Filter
+    lf.embedding_cache = lf.result_cache = None
+    lf.collection_version = (0, 0.0)
+
+
+def prepare(mode, path, articles, iterations, qdrant, embedder, run_id):
+    """
+    Events for one scenario, plus the per-request setup that puts the
+    container on the scenario's cache path.
+
+    Returns:
+        tuple: (events, before_each)
+    """
+    reset_container(qdrant, embedder)
+
+    if path in ("cache_cold", "miss"):
+        events = [{"body": json.dumps(build_request(mode, articles, i, nonce=f"{run_id}{path}{i}"))}
+                  for i in range(iterations)]
+    else:
+        events = [{"body": json.dumps(build_request(mode, articles, i))} for i in range(iterations)]
+        for event in events:  # Warm the caches with every distinct request
+            lf.lambda_handler(event, None)
+
+    def before_each():
+        if path == "cache_cold":
+            reset_container(qdrant, embedder)
+        elif path == "embed_hit":
+            lf.result_cache = ResultCache(maxsize=256, ttl_seconds=300)
+
+    return events, before_each
+
+
+def measure(mode, path, articles, iterations, qdrant, embedder):
+    events, before_each = prepare(mode, path, articles, iterations, qdrant, embedder, "t")
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for event in events:
+        before_each()
+        start = time.perf_counter()
+        response = lf.lambda_handler(event, None)
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += response["statusCode"] != 200
+    total = time.perf_counter() - started
+
+    # Allocation pass on fresh events, so miss paths still miss
+    events, before_each = prepare(mode, path, articles, min(iterations, ALLOCATION_ITERATIONS),
+                                  qdrant, embedder, "a")
+    peaks = []
+    tracemalloc.start()
+    for event in events:
+        before_each()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        lf.lambda_handler(event, None)
+        peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    tracemalloc.stop()
+
+    quantiles = np.percentile(latencies, [50, 95, 99])
+    return {
+        "p50_ms": round(float(quantiles[0]), 3),
+        "p95_ms": round(float(quantiles[1]), 3),
+        "p99_ms": round(float(quantiles[2]), 3),
+        "requests_per_sec": round(len(latencies) / total, 1),
+        "peak_alloc_kb": round(statistics.median(peaks), 1),
+        "errors": errors,
+    }
+
+
+def time_cold_start(mode, files, articles, embed_ms):
+    """Cold start stage latencies (ms) for one mode's first request, in a fresh interpreter"""
+    code = f"""
+import json, time
+t = time.perf_counter()
+import lambda_function as lf
+timings = {{"import": (time.perf_counter() - t) * 1000}}
+t = time.perf_counter()
+lf.initialise_clients()
+timings["initialise_clients"] = (time.perf_counter() - t) * 1000
+t = time.perf_counter()
+lf.initialise_local_index()
+timings["initialise_local_index"] = (time.perf_counter() - t) * 1000
+
+import logging
+import benchmark_handler as bh
+logging.getLogger().setLevel(logging.WARNING)
+files = bh.corpus_files()
+embedder = bh.FakeEmbedder(embed_ms={embed_ms!r})
+lf.qdrant_client, _ = bh.load_index(files[:{files}], embedder)
+lf.vo_client = embedder
+event = {{"body": json.dumps(bh.build_request({mode!r}, bh.load_articles(files[{files}:], {articles}), 0))}}
+t = time.perf_counter()
+response = lf.lambda_handler(event, None)
+timings["first_request"] = (time.perf_counter() - t) * 1000
+assert response["statusCode"] == 200, response["body"]
+print(json.dumps(timings))
+"""
+    # Placeholder credentials: the SDK clients are constructed but never called
+    env = {**os.environ, "CLIENT_MODE": "sdk", "VOYAGE_API_KEY": "benchmark",
+           "QDRANT_URL": "https://localhost:6333", "QDRANT_API_KEY": "benchmark", "LOCAL_INDEX_DIR": ""}
+    proc = subprocess.run([sys.executable, "-c", code], cwd=LAMBDA_DIR, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        print(f"  {mode}: failed - {proc.stderr.strip().splitlines()[-1:]}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_cold_start(mode, files, articles, embed_ms, runs):
+    """Median of each cold start stage over `runs` fresh interpreters"""
+    samples = [time_cold_start(mode, files, articles, embed_ms) for _ in range(runs)]
+    if not runs or None in samples:
+        return None
+    stats = {stage: round(statistics.median(s[stage] for s in samples), 3) for stage in COLD_START_STAGES}
+    stats["total"] = round(statistics.median(sum(s.values()) for s in samples), 3)
+    return stats
+
+
+def compare(results, baseline):
+    """Scenarios whose p50 or p95, or cold start total, regressed beyond REGRESSION_THRESHOLD"""
+    regressions = []
+    for mode, stats in results["cold_start"].items():
+        old = (baseline.get("cold_start", {}).get(mode) or {}).get("total")
+        if stats and old and stats["total"] > old * REGRESSION_THRESHOLD:
+            regressions.append(f"cold_start.{mode}.total: {old:.2f}ms -> {stats['total']:.2f}ms")
+    for name, stats in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if old.get(metric) and stats[metric] > old[metric] * REGRESSION_THRESHOLD:
+                regressions.append(f"{name}.{metric}: {old[metric]:.2f}ms -> {stats[metric]:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline lambda_handler benchmark")
+    parser.add_argument("--files", type=int, default=20, help="Extracted 10-K files loaded into the index")
+    parser.add_argument("--articles", type=int, default=16, help="Distinct articles replayed")
+    parser.add_argument("--iterations", type=int, default=50, help="Requests per scenario")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="Simulated Voyage latency per call")
+    parser.add_argument("--cold-runs", type=int, default=3, help="Fresh interpreters per mode for cold starts (0 skips)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--output", type=str, help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Compare against a previous results file")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)  # The handler logs every request at INFO
+
+    json_files = corpus_files()
+    if not json_files:
+        raise SystemExit(f"No extracted 10-K files in {EXTRACTED_DIR}")
+
+    embedder = FakeEmbedder(embed_ms=args.embed_ms)
+    start = time.perf_counter()
+    qdrant, point_count = load_index(json_files[:args.files], embedder)
+    articles = load_articles(json_files[args.files:], args.articles)
+    print(f"Index: {point_count:,} chunks from {min(args.files, len(json_files))} files "
+          f"({time.perf_counter() - start:.1f}s), {len(articles)} articles, "
+          f"embed latency {args.embed_ms:g}ms\n")
+
+    results = {
+        "python": sys.version.split()[0],
+        "measured_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "config": {"files": args.files, "articles": len(articles), "iterations": args.iterations,
+                   "embed_ms": args.embed_ms, "cold_runs": args.cold_runs, "points": point_count},
+        "cold_start": {},
+        "scenarios": {},
+    }
+
+    if args.cold_runs:
+        print(f"Cold start (fresh interpreter, median of {args.cold_runs})")
+        print(f"{'mode':<10} {'import':>9} {'clients':>9} {'index':>9} {'request':>9} {'total':>9}  (ms)")
+        for mode in args.modes:
+            stats = measure_cold_start(mode, args.files, args.articles, args.embed_ms, args.cold_runs)
+            results["cold_start"][mode] = stats
+            if stats is None:
+                continue
+            print(f"{mode:<10} " + " ".join(f"{stats[stage]:>9.2f}" for stage in COLD_START_STAGES)
+                  + f" {stats['total']:>9.2f}")
+        print()
+
+    print("Warm container")
+
+    print(f"{'scenario':<22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'peak KB':>9} {'errors':>6}")
+    for mode in args.modes:
+        for path in PATHS:
+            stats = measure(mode, path, articles, args.iterations, qdrant, embedder)
+            name = f"{mode}.{path}"
+            results["scenarios"][name] = stats
+            print(f"{name:<22} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} "
+                  f"{stats['requests_per_sec']:>8.1f} {stats['peak_alloc_kb']:>9.1f} {stats['errors']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
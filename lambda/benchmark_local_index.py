@@ -0,0 +1,85 @@
+"""
+Recall and latency benchmark for the quantized local index.
+
+Queries default to a sample of the snapshot's own chunk vectors (each query's
+own row is dropped from both result lists), or can be given as a JSONL file of
+article embeddings. Recall@k of QuantizedIndex is measured against exact
+search for several rescore factors.
+
+Usage:
+    python benchmark_local_index.py SNAPSHOT_DIR [--queries 200] [--k 6] [--query-file vectors.jsonl]
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from local_index import LocalIndex, QuantizedIndex
+
+RESCORE_FACTORS = [1, 2, 4, 8, 16]
+
+
+def load_queries(index: LocalIndex, count: int, query_file: str | None, seed: int):
+    """(vector, own row or None) pairs"""
+    if query_file:
+        with open(query_file, 'r') as f:
+            return [(json.loads(line), None) for line in f if line.strip()][:count]
+
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(index), size=min(count, len(index)), replace=False)
+    return [(index.vectors[row].astype(np.float32), int(row)) for row in rows]
+
+
+def top_rows(index: LocalIndex, vector, k: int, own_row):
+    rows, _ = index.ranked(vector, k + 1)
+    return [int(r) for r in rows if r != own_row][:k]
+
+
+def timed(fn, queries):
+    """Results and per-query latencies (ms)"""
+    results, latencies = [], []
+    for vector, own_row in queries:
+        start = time.perf_counter()
+        results.append(fn(vector, own_row))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantized local index benchmark")
+    parser.add_argument("snapshot", help="Snapshot directory exported with --snapshot-quantize")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    parser.add_argument("--k", type=int, default=6, help="Recall cutoff (the handler returns 6)")
+    parser.add_argument("--query-file", type=str, help="JSONL of query vectors instead of sampled chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    exact = LocalIndex(args.snapshot)
+    quantized = QuantizedIndex(args.snapshot)
+    queries = load_queries(exact, args.queries, args.query_file, args.seed)
+
+    print(f"Snapshot: {len(exact):,} x {exact.vectors.shape[1]} ({exact.vectors.dtype})")
+    print(f"In-memory matrix: {exact.vectors.nbytes / 1e6:.1f} MB full precision, "
+          f"{quantized.quantized.nbytes / 1e6:.1f} MB int8")
+    print(f"Queries: {len(queries)}\n")
+
+    truth, exact_ms = timed(lambda v, own: top_rows(exact, v, args.k, own), queries)
+    print(f"{'mode':<16} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'exact':<16} {1.0:>10.4f} {statistics.median(exact_ms):>8.2f} "
+          f"{np.percentile(exact_ms, 95):>8.2f}")
+
+    for factor in RESCORE_FACTORS:
+        quantized.rescore_factor = factor
+        found, ms = timed(lambda v, own: top_rows(quantized, v, args.k, own), queries)
+        recall = statistics.mean(
+            len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if t
+        )
+        print(f"{'int8 x' + str(factor):<16} {recall:>10.4f} {statistics.median(ms):>8.2f} "
+              f"{np.percentile(ms, 95):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Cold start benchmark for the vectormatch Lambda.
+
+Measures, per dependency, the import time in a fresh interpreter (median of
+several runs) and, when API credentials are available, the latency of the
+first and second request through each client mode. Results can be written to
+JSON and compared against a previous run to catch regressions.
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--output startup.json] [--baseline old.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+LAMBDA_DIR = Path(__file__).parent
+
+IMPORTS = {
+    "voyageai": "import voyageai",
+    "qdrant_client": "from qdrant_client import QdrantClient",
+    "qdrant_client.models": "from qdrant_client.models import SearchRequest",
+    "rest_clients": "import rest_clients",
+    "lambda_function": "import lambda_function",
+}
+
+REGRESSION_THRESHOLD = 1.25  # Flag anything 25% slower than the baseline
+
+
+def time_import(statement: str, runs: int) -> float | None:
+    """Median wall time (ms) of an import statement in a fresh interpreter"""
+    code = (
+        "import time; t = time.perf_counter(); "
+        f"{statement}; "
+        "print((time.perf_counter() - t) * 1000)"
+    )
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=LAMBDA_DIR, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            return None
+        samples.append(float(proc.stdout.strip()))
+    return statistics.median(samples)
+
+
+def time_first_requests(mode: str) -> dict | None:
+    """First and second request latency (ms) for one client mode, in a fresh interpreter"""
+    if not all(os.environ.get(k) for k in ("VOYAGE_API_KEY", "QDRANT_URL", "QDRANT_API_KEY")):
+        return None
+
+    code = f"""
+import json, time
+t = time.perf_counter()
+import lambda_function as lf
+timings = {{"import": (time.perf_counter() - t) * 1000}}
+t = time.perf_counter()
+vo, qdrant = lf.initialise_clients()
+timings["initialise_clients"] = (time.perf_counter() - t) * 1000
+for label in ("first", "second"):
+    t = time.perf_counter()
+    vector = vo.embed(["pocketstox startup benchmark"], model=lf.EMBEDDING_MODEL, input_type="document").embeddings[0]
+    timings["voyage_" + label] = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    qdrant.search(collection_name=lf.COLLECTION_NAME, query_vector=vector, limit=lf.SEARCH_LIMIT, with_payload=True)
+    timings["qdrant_" + label] = (time.perf_counter() - t) * 1000
+print(json.dumps(timings))
+"""
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=LAMBDA_DIR, capture_output=True, text=True,
+        env={**os.environ, "CLIENT_MODE": mode}
+    )
+    if proc.returncode != 0:
+        print(f"  {mode}: failed - {proc.stderr.strip().splitlines()[-1:]}")
+        return None
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """Names of measurements that regressed beyond REGRESSION_THRESHOLD"""
+    regressions = []
+    for section in ("imports", "requests"):
+        for name, value in _flatten(results.get(section, {})).items():
+            old = _flatten(baseline.get(section, {})).get(name)
+            if value is not None and old and value > old * REGRESSION_THRESHOLD:
+                regressions.append(f"{section}.{name}: {old:.1f}ms -> {value:.1f}ms")
+    return regressions
+
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in d.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lambda cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per import")
+    parser.add_argument("--output", type=str, help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=str, help="Compare against a previous results file")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "measured_at": time.strftime('%Y-%m-%d %H:%M:%S')}
+
+    print(f"Import time (median of {args.runs} fresh interpreters)")
+    results["imports"] = {}
+    for name, statement in IMPORTS.items():
+        ms = time_import(statement, args.runs)
+        results["imports"][name] = ms
+        print(f"  {name:<22} {'not installed' if ms is None else f'{ms:8.1f} ms'}")
+
+    print("\nFirst request latency")
+    results["requests"] = {}
+    for mode in ("sdk", "rest"):
+        timings = time_first_requests(mode)
+        results["requests"][mode] = timings
+        if timings is None:
+            print(f"  {mode}: skipped (credentials not set or run failed)")
+            continue
+        print(f"  {mode}: " + ", ".join(f"{k}={v:.1f}ms" for k, v in timings.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
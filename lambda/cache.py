@@ -0,0 +1,249 @@
+"""
+Caching for the vectormatch handler.
+
+Embeddings are keyed by a hash of the normalised article content plus the model
+name. The in-process LRU tier is held in a module-level global by the handler so
+it survives Lambda warm starts; the optional shared tier sits behind
+``CacheBackend`` so any store with get/set semantics can be plugged in.
+
+Serialized search results are cached the same way, keyed additionally by the
+query parameters and the collection version so a re-ingest invalidates them.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import struct
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+
+def normalise_content(content):
+    """Collapse whitespace so re-scraped copies of an article share a key"""
+    return " ".join(content.split())
+
+
+def content_hash(content, model):
+    """
+    Stable cache key for a piece of content embedded with a given model.
+
+    Returns:
+        str: hex sha256 digest
+    """
+    normalised = normalise_content(content)
+    return hashlib.sha256(f"{model}\x00{normalised}".encode("utf-8")).hexdigest()
+
+
+def pack_vector(vector):
+    """Serialise a vector as little-endian float32 bytes"""
+    return struct.pack(f"<{len(vector)}f", *vector)
+
+
+def unpack_vector(blob):
+    """Inverse of pack_vector"""
+    return list(struct.unpack(f"<{len(blob) // 4}f", blob))
+
+
+class LRUCache:
+    """Bounded in-process cache, least recently used entries are evicted first"""
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend:
+    """
+    Interface for a shared cache tier.
+
+    Implementations store opaque bytes under string keys. Returning None from
+    get() is treated as a miss.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    CacheBackend on a local SQLite file.
+
+    Good enough as a shared tier on EFS or /tmp, and as a stand-in for a
+    networked store when running locally.
+    """
+
+    def __init__(self, path, ttl_seconds=None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        row = self._conn.execute(
+            "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, created_at = row
+        if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+            return None
+        return value
+
+    def set(self, key, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        self._conn.commit()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: in-process LRU first, then the optional shared
+    backend. Shared hits are promoted into the LRU.
+    """
+
+    def __init__(self, maxsize=512, backend=None):
+        self.lru = LRUCache(maxsize)
+        self.backend = backend
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, content, model):
+        key = content_hash(content, model)
+
+        vector = self.lru.get(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        if self.backend is not None:
+            try:
+                blob = self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Shared embedding cache read failed: {str(e)}")
+                blob = None
+            if blob is not None:
+                vector = unpack_vector(blob)
+                self.lru.set(key, vector)
+                self.hits += 1
+                self.shared_hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    def set(self, content, model, vector):
+        key = content_hash(content, model)
+        self.lru.set(key, vector)
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, pack_vector(vector))
+            except Exception as e:
+                logger.warning(f"Shared embedding cache write failed: {str(e)}")
+
+    def stats(self):
+        """Counters for the request logs"""
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "size": len(self.lru),
+        }
+
+
+def result_cache_key(content_key, query_params, filters, collection_version):
+    """
+    Key for a cached search result.
+
+    Args:
+        content_key: content_hash() of the article
+        query_params: canonical query parameters (limit, query_mode, fusion,
+            include_snippet) or grouping parameters, as a JSON-serialisable dict
+        filters: canonical (JSON-serialisable) filter form, or None
+        collection_version: version marker of the searched collection
+    """
+    raw = json.dumps([content_key, query_params, filters, collection_version], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    TTL cache of serialized search results (JSON strings).
+
+    Entries carry their own expiry so the same CacheBackend implementations
+    used for embeddings can hold them.
+    """
+
+    def __init__(self, maxsize=256, ttl_seconds=300, backend=None):
+        self.lru = LRUCache(maxsize)
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+
+        entry = self.lru.get(key)
+        if entry is None and self.backend is not None:
+            try:
+                blob = self.backend.get(key)
+            except Exception as e:
+                logger.warning(f"Shared result cache read failed: {str(e)}")
+                blob = None
+            if blob is not None:
+                expires_at = struct.unpack("<d", blob[:8])[0]
+                entry = (expires_at, blob[8:].decode("utf-8"))
+                self.lru.set(key, entry)
+
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        self.lru.set(key, (expires_at, value))
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, struct.pack("<d", expires_at) + value.encode("utf-8"))
+            except Exception as e:
+                logger.warning(f"Shared result cache write failed: {str(e)}")
+
+    def stats(self):
+        """Counters for the request logs"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.lru)}
@@ -1,23 +1,80 @@
 import json
 import os
+import re
+import time
+import hashlib
 import logging
-import voyageai
-from qdrant_client import QdrantClient
+from cache import EmbeddingCache, ResultCache, SQLiteBackend, content_hash, result_cache_key
+from query_chunking import CHARS_PER_TOKEN, fuse_results, split_query
+from rate_limiter import RateLimiter, RateLimitExceeded, retry_after_seconds
+from search_filters import parse_filters, to_qdrant_filter
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+EMBEDDING_MODEL = "voyage-finance-2"
+# Alias moved atomically by embed_and_ingest.py --blue-green; Qdrant resolves it on every search.
+# embed_and_ingest.py reads the same variable and default, and bumps this name's version marker
+COLLECTION_NAME = os.environ.get("COLLECTION_ALIAS", "pocketstox-embeddings")
+META_COLLECTION_NAME = "pocketstox-meta"
+SEARCH_LIMIT = 6
+MAX_CONTENT_CHARS = 50000
+MAX_CHUNKED_CONTENT_CHARS = 400000  # Bounds tokenization time in chunked mode
+MAX_QUERY_PIECES = 16  # Bounds embed tokens and searches per chunked query
+MAX_BATCH_ARTICLES = 128  # Voyage accepts up to 128 texts per embed call
+MAX_BATCH_TOKENS = 100_000  # Voyage caps finance-2 at 120K tokens per call; estimated with CHARS_PER_TOKEN
+GROUP_SIZE = 3  # Chunks returned per company in grouped mode
+SNIPPET_CHARS = 300  # Upper bound on an include_snippet highlight
+
+# Payload fields read by format_matches. Searches fetch only these (plus the
+# chunk text when a snippet is requested) instead of the whole payload.
+MATCH_FIELDS = [
+    "ticker", "company_name", "exchange", "cik", "section", "subsection",
+    "filing_date", "fiscal_year", "industry", "sic_code", "chunk_id",
+]
+MAX_GROUPS = 20
+MAX_GROUP_SIZE = 10
+VERSION_CHECK_SECONDS = int(os.environ.get("VERSION_CHECK_SECONDS", "30"))
+
+# Per-container Voyage budget (0 = unlimited). Retry-After hints from Voyage
+# are honoured either way; a request that cannot be admitted within
+# RATE_LIMIT_MAX_WAIT seconds fails instead of holding the invocation.
+VOYAGE_RPM = int(os.environ.get("VOYAGE_RPM", "0"))
+VOYAGE_TPM = int(os.environ.get("VOYAGE_TPM", "0"))
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", "2"))
+
+# "sdk" uses voyageai/qdrant_client, "rest" the stdlib clients in rest_clients.py
+CLIENT_MODE = os.environ.get("CLIENT_MODE", "sdk")
+QDRANT_TIMEOUT = int(os.environ.get("QDRANT_TIMEOUT", "5"))  # Seconds before falling back to the local index
+
+# Snapshot written by embed_and_ingest.py --export-snapshot. With SEARCH_BACKEND
+# "qdrant" it is only used when Qdrant fails; "local" serves every search from it.
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR")
+LOCAL_INDEX_QUANTIZED = os.environ.get("LOCAL_INDEX_QUANTIZED", "") == "1"  # int8 scoring + rescoring
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "qdrant")
+
 vo_client = None
 qdrant_client = None
+SearchRequest = None  # Request type matching the active Qdrant client
+QueryFilter = None  # Filter type matching the active Qdrant client (None: REST JSON)
+local_index = None  # False once loading has failed in this container
+fallback_searches = 0  # Searches served by the local index because Qdrant failed
+embedding_cache = None
+result_cache = None
+collection_version = (0, 0.0)  # (version, checked_at)
+voyage_limiter = RateLimiter(max_requests=VOYAGE_RPM or None, max_tokens=VOYAGE_TPM or None)
 
 def initialise_clients():
     """
     API clients initialization with caching for lambda warm starts.
+
+    Client libraries are imported here rather than at module load so a cold
+    start only pays for the ones CLIENT_MODE selects.
     
     Returns:
         tuple: (voyage_client, qdrant_client)
     """
-    global vo_client, qdrant_client
+    global vo_client, qdrant_client, SearchRequest, QueryFilter
     
     if vo_client is not None and qdrant_client is not None:
         logger.info("Using cached API clients")
@@ -31,25 +88,409 @@ def initialise_clients():
         if not all([vo_api_key, qdrant_url, qdrant_api_key]):
             raise ValueError("Missing required environment variables")
 
-        vo_client = voyageai.Client(api_key=vo_api_key)
-        qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+        if CLIENT_MODE == "rest":
+            import rest_clients
+            vo_client = rest_clients.VoyageRestClient(api_key=vo_api_key)
+            qdrant_client = rest_clients.QdrantRestClient(url=qdrant_url, api_key=qdrant_api_key, timeout=QDRANT_TIMEOUT)
+            SearchRequest = rest_clients.SearchRequest
+            QueryFilter = None
+        else:
+            import voyageai
+            from qdrant_client import QdrantClient
+            from qdrant_client.models import Filter as QdrantFilter, SearchRequest as QdrantSearchRequest
+            vo_client = voyageai.Client(api_key=vo_api_key)
+            qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key, timeout=QDRANT_TIMEOUT)
+            SearchRequest = QdrantSearchRequest
+            QueryFilter = QdrantFilter
 
-        logger.info("API clients initialized successfully")
+        logger.info(f"API clients initialized successfully ({CLIENT_MODE} mode)")
         return vo_client, qdrant_client
 
     except Exception as e:
         logger.error(f"Failed to initialize clients: {str(e)}")
         raise
 
+def initialise_local_index():
+    """
+    Load the local snapshot index once per container, if one is configured.
+    A failed load is not retried until the next cold start.
+
+    Returns:
+        LocalIndex, or None if not configured or not loadable
+    """
+    global local_index
+
+    if local_index is not None or not LOCAL_INDEX_DIR:
+        return local_index or None
+
+    try:
+        from local_index import LocalIndex, QuantizedIndex
+        index_cls = QuantizedIndex if LOCAL_INDEX_QUANTIZED else LocalIndex
+        local_index = index_cls(LOCAL_INDEX_DIR)
+        logger.info(f"Local index loaded: {len(local_index)} vectors from {LOCAL_INDEX_DIR} ({index_cls.__name__})")
+    except Exception as e:
+        logger.error(f"Failed to load local index, disabled for this container: {str(e)}")
+        local_index = False
+    return local_index or None
+
+def run_search(qdrant, method, **kwargs):
+    """
+    Run a QdrantClient search method, on the local index when SEARCH_BACKEND
+    is "local", or falling back to it when Qdrant errors or times out.
+    Fallbacks are counted in fallback_searches, so callers can keep those
+    answers out of the result cache.
+    """
+    global fallback_searches
+
+    if local_index and SEARCH_BACKEND == "local":
+        return getattr(local_index, method)(**kwargs)
+
+    try:
+        return getattr(qdrant, method)(**kwargs)
+    except Exception as e:
+        if not local_index:
+            raise
+        logger.warning(f"Qdrant {method} failed, using local index: {str(e)}")
+        fallback_searches += 1
+        return getattr(local_index, method)(**kwargs)
+
+def cache_result(results, result_key, result_json, fallbacks_before):
+    """Cache a serialized result, unless a search behind it fell back to the local index"""
+    if fallback_searches != fallbacks_before:
+        logger.info("Result served from the local index fallback, not cached")
+        return
+    results.set(result_key, result_json)
+
+def initialise_caches():
+    """
+    Embedding and result caches, kept global so they survive warm starts.
+
+    EMBEDDING_CACHE_SIZE and RESULT_CACHE_SIZE set the in-process LRU
+    capacities and RESULT_CACHE_TTL the result lifetime in seconds.
+    CACHE_PATH, if set, enables a shared SQLite tier at that path (e.g. on EFS).
+
+    Returns:
+        tuple: (embedding_cache, result_cache)
+    """
+    global embedding_cache, result_cache
+
+    if embedding_cache is not None and result_cache is not None:
+        return embedding_cache, result_cache
+
+    backend = None
+    cache_path = os.environ.get("CACHE_PATH")
+    if cache_path:
+        try:
+            backend = SQLiteBackend(cache_path)
+        except Exception as e:
+            logger.warning(f"Shared cache unavailable: {str(e)}")
+
+    embedding_cache = EmbeddingCache(
+        maxsize=int(os.environ.get("EMBEDDING_CACHE_SIZE", "512")),
+        backend=backend,
+    )
+    result_cache = ResultCache(
+        maxsize=int(os.environ.get("RESULT_CACHE_SIZE", "256")),
+        ttl_seconds=int(os.environ.get("RESULT_CACHE_TTL", "300")),
+        backend=backend,
+    )
+    return embedding_cache, result_cache
+
+def get_collection_version(qdrant, collection_name):
+    """
+    Version marker of a collection, bumped by embed_and_ingest.py after every
+    ingest. The marker is re-read at most every VERSION_CHECK_SECONDS.
+
+    Returns:
+        int: current version, 0 if no marker has been written yet
+    """
+    global collection_version
+
+    version, checked_at = collection_version
+    if time.time() - checked_at < VERSION_CHECK_SECONDS:
+        return version
+
+    try:
+        records = qdrant.retrieve(
+            collection_name=META_COLLECTION_NAME,
+            ids=[version_marker_id(collection_name)],
+            with_payload=True
+        )
+        version = records[0].payload.get("version", 0) if records else 0
+    except Exception as e:
+        logger.warning(f"Could not read collection version, keeping {version}: {str(e)}")
+
+    collection_version = (version, time.time())
+    return version
+
+def version_marker_id(collection_name):
+    """Point id of a collection's version marker (same scheme as chunk_to_point)"""
+    return int(hashlib.md5(collection_name.encode()).hexdigest(), 16) % (2**63)
+
+def embed_articles(vo, cache, contents):
+    """
+    Embed article contents, going through the embedding cache first.
+
+    Cache misses are sent to Voyage in as few calls as possible (up to
+    MAX_BATCH_ARTICLES texts and an estimated MAX_BATCH_TOKENS each) under
+    voyage_limiter.
+
+    Returns:
+        list: one vector per content, or the Exception raised embedding it
+    """
+    vectors = [cache.get(content, EMBEDDING_MODEL) for content in contents]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    for indices in token_batches(missing, contents):
+        embedded = embed_uncached(vo, [contents[i] for i in indices])
+
+        for i, vector in zip(indices, embedded):
+            vectors[i] = vector
+            if not isinstance(vector, Exception):
+                cache.set(contents[i], EMBEDDING_MODEL, vector)
+
+    return vectors
+
+def token_batches(indices, contents):
+    """
+    Group content indices in order into batches bounded by MAX_BATCH_ARTICLES
+    and an estimated MAX_BATCH_TOKENS. An article over the token budget on its
+    own is sent as a batch of one.
+    """
+    batch, batch_tokens = [], 0
+    for i in indices:
+        tokens = len(contents[i]) // CHARS_PER_TOKEN
+        if batch and (len(batch) >= MAX_BATCH_ARTICLES or batch_tokens + tokens > MAX_BATCH_TOKENS):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def embed_uncached(vo, texts):
+    """
+    One Voyage call for texts already known to miss the cache. If it fails,
+    the texts are retried one at a time so a single bad article cannot fail
+    the others; a rate limit failure is not retried.
+
+    Returns:
+        list: one vector per text, or the Exception raised embedding it
+    """
+    tokens = sum(len(text) for text in texts) // CHARS_PER_TOKEN
+    try:
+        if voyage_limiter.acquire(tokens, timeout=RATE_LIMIT_MAX_WAIT) is None:
+            raise RateLimitExceeded(f"Voyage rate limit: not admitted within {RATE_LIMIT_MAX_WAIT}s")
+        return vo.embed(texts, model=EMBEDDING_MODEL, input_type="document").embeddings
+    except Exception as e:
+        retry_after = retry_after_seconds(e)
+        if retry_after is not None:
+            voyage_limiter.backoff(retry_after)
+        if len(texts) == 1 or retry_after is not None or isinstance(e, RateLimitExceeded):
+            return [e] * len(texts)
+        logger.warning(f"Batch embed of {len(texts)} articles failed, retrying singly: {str(e)}")
+        return [embed_uncached(vo, [text])[0] for text in texts]
+
+def payload_fields(snippet_terms):
+    """with_payload projection for a search: the match fields, plus text for snippets"""
+    return MATCH_FIELDS + ["text"] if snippet_terms is not None else MATCH_FIELDS
+
+def query_terms(content):
+    """Distinct lowercase words of 4+ letters in the article, used to pick snippets"""
+    return set(re.findall(r"[a-z]{4,}", content.lower()))
+
+def make_snippet(text, terms):
+    """
+    The sentence of a chunk sharing the most words with the article, cut to
+    SNIPPET_CHARS. None when the hit carries no text (e.g. local index).
+    """
+    if not text:
+        return None
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    best = max(sentences, key=lambda sentence: len(terms.intersection(re.findall(r"[a-z]{4,}", sentence.lower()))))
+    if len(best) > SNIPPET_CHARS:
+        best = best[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+    return best
+
+def format_matches(search_results, snippet_terms=None):
+    """
+    Convert Qdrant hits into the matches schema returned to the extension.
+    With snippet_terms (see query_terms), each match also carries a snippet.
+    """
+    matches = []
+    for hit in search_results:
+        match = {
+            "score": round(hit.score, 4),
+            "ticker": hit.payload.get("ticker", ""),
+            "company": hit.payload.get("company_name", ""),
+            "exchange": hit.payload.get("exchange", ""),
+            "cik": hit.payload.get("cik", ""),
+            "section": hit.payload.get("section", ""),
+            "subsection": hit.payload.get("subsection"),
+            "filing_date": hit.payload.get("filing_date", ""),
+            "fiscal_year": hit.payload.get("fiscal_year", ""),
+            "industry": hit.payload.get("industry", ""),
+            "sic_code": hit.payload.get("sic_code", ""),
+            "chunk_id": hit.payload.get("chunk_id", ""),
+        }
+        if snippet_terms is not None:
+            match["snippet"] = make_snippet(hit.payload.get("text"), snippet_terms)
+        matches.append(match)
+    return matches
+
+def format_companies(groups, snippet_terms=None):
+    """
+    Convert Qdrant groups (one per ticker) into company-level results.
+
+    Each company carries its best chunk score, the mean over its returned
+    chunks and the chunks themselves, best first.
+    """
+    companies = []
+    for group in groups:
+        matches = format_matches(group.hits, snippet_terms)
+        if not matches:
+            continue
+        best = matches[0]
+        scores = [hit.score for hit in group.hits]
+        companies.append({
+            "ticker": best["ticker"],
+            "company": best["company"],
+            "exchange": best["exchange"],
+            "cik": best["cik"],
+            "industry": best["industry"],
+            "sic_code": best["sic_code"],
+            "score": best["score"],
+            "mean_score": round(sum(scores) / len(scores), 4),
+            "hit_count": len(matches),
+            "matches": matches,
+        })
+    return companies
+
+def parse_grouping(body):
+    """
+    Validate the grouped search parameters of a request body.
+
+    Raises:
+        ValueError: if a parameter is unsupported or out of range
+
+    Returns:
+        dict: canonical grouping parameters (also used in the result cache key)
+    """
+    group_by = body.get("group_by")
+    if group_by != "ticker":
+        raise ValueError("group_by only supports 'ticker'")
+
+    grouping = {"group_by": group_by}
+    for field, default, maximum in (
+        ("companies", SEARCH_LIMIT, MAX_GROUPS),
+        ("chunks_per_company", GROUP_SIZE, MAX_GROUP_SIZE),
+    ):
+        value = body.get(field, default)
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= maximum:
+            raise ValueError(f"{field} must be an integer between 1 and {maximum}")
+        grouping[field] = value
+    return grouping
+
+def parse_query_mode(body, content, grouping):
+    """
+    Validate query_mode/fusion. Articles longer than MAX_CONTENT_CHARS are
+    queried in chunked mode unless a mode is given explicitly.
+
+    Raises:
+        ValueError: if a parameter is unsupported
+
+    Returns:
+        dict: canonical query parameters (also used in the result cache key)
+    """
+    default_mode = "chunked" if len(content) > MAX_CONTENT_CHARS and not grouping else "single"
+    query_mode = body.get("query_mode", default_mode)
+    if query_mode not in ("single", "chunked"):
+        raise ValueError("query_mode must be 'single' or 'chunked'")
+    if query_mode == "chunked" and grouping:
+        raise ValueError("group_by is not supported with chunked queries")
+
+    query = {"limit": SEARCH_LIMIT, "query_mode": query_mode}
+    if parse_include_snippet(body):
+        query["include_snippet"] = True
+    if query_mode == "chunked":
+        fusion = body.get("fusion", "rrf")
+        if fusion not in ("rrf", "max"):
+            raise ValueError("fusion must be 'rrf' or 'max'")
+        query["fusion"] = fusion
+    return query
+
+def parse_include_snippet(body):
+    """
+    Raises:
+        ValueError: if include_snippet is not a boolean
+    """
+    include_snippet = body.get("include_snippet", False)
+    if not isinstance(include_snippet, bool):
+        raise ValueError("include_snippet must be a boolean")
+    return include_snippet
+
+def build_query_filter(filters):
+    """Qdrant filter for canonical request filters, typed for the active client"""
+    query_filter = to_qdrant_filter(filters)
+    if query_filter is not None and QueryFilter is not None:
+        return QueryFilter.model_validate(query_filter)
+    return query_filter
+
+def search_chunked(vo, qdrant, cache, content, fusion, snippet_terms=None, query_filter=None):
+    """
+    Query with a long article split into pieces like the indexed chunks.
+
+    The pieces are embedded in one call and searched with one batch search,
+    then the per-piece rankings are fused by chunk_id. Each match keeps its
+    best cosine score; ordering follows the fused score.
+
+    Returns:
+        list: matches in the same schema as single queries
+    """
+    pieces = split_query(content, MAX_QUERY_PIECES)
+    logger.info(f"Chunked query: {len(pieces)} pieces, {fusion} fusion")
+
+    vectors = embed_articles(vo, cache, pieces)
+    logger.info(f"Embedding cache: {cache.stats()}")
+    for vector in vectors:
+        if isinstance(vector, Exception):
+            raise vector
+
+    batch_results = run_search(
+        qdrant, "search_batch",
+        collection_name=COLLECTION_NAME,
+        requests=[
+            SearchRequest(
+                vector=vector, limit=SEARCH_LIMIT * 2,
+                with_payload=payload_fields(snippet_terms), filter=query_filter
+            )
+            for vector in vectors
+        ]
+    )
+    fused = fuse_results(batch_results, SEARCH_LIMIT, method=fusion)
+    return format_matches([hit for hit, _ in fused], snippet_terms)
+
+def prepare_content(content):
+    """Truncate article content to what we are willing to embed"""
+    if len(content) > MAX_CONTENT_CHARS:
+        logger.info("Content too long, truncating to 50k characters")
+        content = content[:MAX_CONTENT_CHARS]
+    return content
+
 def lambda_handler(event, context):
     try:
         vo, qdrant = initialise_clients()
+        cache, results = initialise_caches()
+        initialise_local_index()
         
         if isinstance(event.get("body"), str):
             body = json.loads(event["body"])
         else:
             body = event.get("body", {})
 
+        if "articles" in body:
+            return handle_batch(vo, qdrant, cache, results, body["articles"], body)
+
         title = body.get("title", "")
         content = body.get("content", "")
         logger.info(f"Processing article: {title[:50]}... ({len(content)} chars)")
@@ -57,46 +498,187 @@ def lambda_handler(event, context):
         if not content:
             return format_response(400, {"error": "No content provided"})
 
-        if len(content) > 50000:
-            logger.info("Content too long, truncating to 50k characters")
-            content = content[:50000]
+        grouping = None
+        try:
+            if body.get("group_by") is not None:
+                grouping = parse_grouping(body)
+            query = parse_query_mode(body, content, grouping)
+            filters = parse_filters(body.get("filters"))
+        except ValueError as e:
+            return format_response(400, {"error": str(e)})
+        result_field = "companies" if grouping else "matches"
 
-        result = vo.embed(content, model="voyage-finance-2", input_type="document")
-        article_vector = result.embeddings[0]
+        if query["query_mode"] == "chunked":
+            content = content[:MAX_CHUNKED_CONTENT_CHARS]
+        else:
+            content = prepare_content(content)
 
-        search_results = qdrant.search(
-            collection_name="pocketstox-embeddings",
-            query_vector=article_vector,
-            limit=6,
-            with_payload=True
+        snippet_terms = query_terms(content) if query.get("include_snippet") else None
+        key_params = grouping or query
+        if grouping and snippet_terms is not None:
+            key_params = {**grouping, "include_snippet": True}
+
+        version = get_collection_version(qdrant, COLLECTION_NAME)
+        result_key = result_cache_key(
+            content_hash(content, EMBEDDING_MODEL), key_params, filters, version
         )
+        cached_result = results.get(result_key)
+        if cached_result is not None:
+            logger.info(f"Result cache hit: {results.stats()}")
+            return format_raw_response(
+                200, f'{{"title": {json.dumps(title)}, "{result_field}": {cached_result}}}'
+            )
 
-        matches = []
-        for hit in search_results:
-            matches.append({
-                "score": round(hit.score, 4),
-                "ticker": hit.payload.get("ticker", ""),
-                "company": hit.payload.get("company_name", ""),
-                "exchange": hit.payload.get("exchange", ""),
-                "cik": hit.payload.get("cik", ""),
-                "section": hit.payload.get("section", ""),
-                "subsection": hit.payload.get("subsection"),
-                "filing_date": hit.payload.get("filing_date", ""),
-                "fiscal_year": hit.payload.get("fiscal_year", ""),
-                "industry": hit.payload.get("industry", ""),
-                "sic_code": hit.payload.get("sic_code", ""),
-                "chunk_id": hit.payload.get("chunk_id", ""),
-            })
-
-        logger.info(f"Found {len(matches)} matches for article")
-        return format_response(200, {"title": title, "matches": matches})
+        query_filter = build_query_filter(filters)
+        fallbacks_before = fallback_searches
+        if query["query_mode"] == "chunked":
+            result = search_chunked(vo, qdrant, cache, content, query["fusion"], snippet_terms, query_filter)
+            logger.info(f"Found {len(result)} matches for article")
+            cache_result(results, result_key, json.dumps(result), fallbacks_before)
+            logger.info(f"Result cache: {results.stats()}")
+            return format_response(200, {"title": title, result_field: result})
+
+        article_vector = embed_articles(vo, cache, [content])[0]
+        logger.info(f"Embedding cache: {cache.stats()}")
+        if isinstance(article_vector, Exception):
+            raise article_vector
+
+        if grouping:
+            groups_result = run_search(
+                qdrant, "search_groups",
+                collection_name=COLLECTION_NAME,
+                query_vector=article_vector,
+                group_by=grouping["group_by"],
+                limit=grouping["companies"],
+                group_size=grouping["chunks_per_company"],
+                with_payload=payload_fields(snippet_terms),
+                query_filter=query_filter
+            )
+            result = format_companies(groups_result.groups, snippet_terms)
+            logger.info(f"Found {len(result)} companies for article")
+        else:
+            search_results = run_search(
+                qdrant, "search",
+                collection_name=COLLECTION_NAME,
+                query_vector=article_vector,
+                limit=SEARCH_LIMIT,
+                with_payload=payload_fields(snippet_terms),
+                query_filter=query_filter
+            )
+            result = format_matches(search_results, snippet_terms)
+            logger.info(f"Found {len(result)} matches for article")
+
+        cache_result(results, result_key, json.dumps(result), fallbacks_before)
+        logger.info(f"Result cache: {results.stats()}")
+        return format_response(200, {"title": title, result_field: result})
 
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         return format_response(500, {"error": f"Internal server error: {str(e)}"})
 
+def handle_batch(vo, qdrant, cache, results, articles, body=None):
+    """
+    Match many articles in one invocation.
+
+    All cache misses are embedded in a single Voyage call and searched with
+    one Qdrant batch search. Failures are reported per article. A top-level
+    include_snippet or filters applies to every article.
+
+    Returns:
+        dict: API response whose body holds one result per input article
+    """
+    body = body or {}
+    if not isinstance(articles, list) or not articles:
+        return format_response(400, {"error": "articles must be a non-empty list"})
+    if len(articles) > MAX_BATCH_ARTICLES:
+        return format_response(400, {"error": f"At most {MAX_BATCH_ARTICLES} articles per request"})
+    try:
+        include_snippet = parse_include_snippet(body)
+        filters = parse_filters(body.get("filters"))
+    except ValueError as e:
+        return format_response(400, {"error": str(e)})
+    # Same key parameters as a single-mode request, so the two share result cache entries
+    key_params = {"limit": SEARCH_LIMIT, "query_mode": "single"}
+    if include_snippet:
+        key_params["include_snippet"] = True
+
+    logger.info(f"Processing batch of {len(articles)} articles")
+    version = get_collection_version(qdrant, COLLECTION_NAME)
+
+    # Serialized per-article results, filled in as each stage resolves them
+    outputs = [None] * len(articles)
+    titles = []
+    pending = []  # (index, content, result_key)
+
+    for i, article in enumerate(articles):
+        if not isinstance(article, dict):
+            titles.append("")
+            outputs[i] = json.dumps({"title": "", "error": "Article must be an object"})
+            continue
+
+        title = article.get("title", "")
+        content = article.get("content", "")
+        titles.append(title)
+        if not content:
+            outputs[i] = json.dumps({"title": title, "error": "No content provided"})
+            continue
+
+        content = prepare_content(content)
+        result_key = result_cache_key(
+            content_hash(content, EMBEDDING_MODEL), key_params, filters, version
+        )
+        cached_matches = results.get(result_key)
+        if cached_matches is not None:
+            outputs[i] = f'{{"title": {json.dumps(title)}, "matches": {cached_matches}}}'
+        else:
+            pending.append((i, content, result_key))
+
+    vectors = embed_articles(vo, cache, [content for _, content, _ in pending])
+    logger.info(f"Embedding cache: {cache.stats()}")
+
+    searches = []
+    for (i, content, result_key), vector in zip(pending, vectors):
+        if isinstance(vector, Exception):
+            outputs[i] = json.dumps({"title": titles[i], "error": f"Embedding failed: {str(vector)}"})
+        else:
+            searches.append((i, result_key, vector, query_terms(content) if include_snippet else None))
+
+    if searches:
+        query_filter = build_query_filter(filters)
+        fallbacks_before = fallback_searches
+        try:
+            batch_results = run_search(
+                qdrant, "search_batch",
+                collection_name=COLLECTION_NAME,
+                requests=[
+                    SearchRequest(
+                        vector=vector, limit=SEARCH_LIMIT,
+                        with_payload=payload_fields(terms), filter=query_filter
+                    )
+                    for _, _, vector, terms in searches
+                ]
+            )
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}", exc_info=True)
+            batch_results = [e] * len(searches)
+
+        for (i, result_key, _, terms), search_results in zip(searches, batch_results):
+            if isinstance(search_results, Exception):
+                outputs[i] = json.dumps({"title": titles[i], "error": f"Search failed: {str(search_results)}"})
+                continue
+            matches_json = json.dumps(format_matches(search_results, terms))
+            cache_result(results, result_key, matches_json, fallbacks_before)
+            outputs[i] = f'{{"title": {json.dumps(titles[i])}, "matches": {matches_json}}}'
+
+    logger.info(f"Result cache: {results.stats()}")
+    return format_raw_response(200, f'{{"results": [{", ".join(outputs)}]}}')
+
 def format_response(status_code, body_dict):
     """Helper function to format the API response"""
+    return format_raw_response(status_code, json.dumps(body_dict))
+
+def format_raw_response(status_code, body_json):
+    """format_response for a body that is already serialized"""
     return {
         "statusCode": status_code,
         "headers": {
@@ -105,7 +687,7 @@ def format_response(status_code, body_dict):
             "Access-Control-Allow-Headers": "Content-Type",
             "Content-Type": "application/json",
         },
-        "body": json.dumps(body_dict),
+        "body": body_json,
     }
 
 # For local testing
@@ -0,0 +1,216 @@
+"""
+In-process exact search over a vector snapshot exported by
+manual/embed_and_ingest.py (--export-snapshot).
+
+A snapshot directory holds:
+    vectors.npy    unit-normalised float16/float32 matrix, one row per point
+    payloads.json  {"fields": [...], "ids": [...], "rows": [[...], ...]}
+    meta.json      collection name, count, dimension, dtype
+
+and, when exported with --snapshot-quantize:
+    vectors_int8.npy  the same matrix scalar-quantized to int8
+    scales.npy        float32 per-dimension scale (value ~= int8 * scale)
+
+The matrix is memory-mapped, so loading is cheap and pages are only read as
+they are scored. LocalIndex mirrors the QdrantClient search methods used by
+the handler, including the match/range filters built by search_filters.py,
+so it can stand in for Qdrant directly. QuantizedIndex keeps only
+the int8 matrix in memory and reads full-precision rows just for rescoring.
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+BLOCK_ROWS = 8192  # Rows scored per block; bounds float32 conversion memory
+RESCORE_FACTOR = 8  # Quantized candidates rescored per requested result
+
+
+class LocalIndex:
+    """Exact cosine top-k over a memory-mapped snapshot"""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, "payloads.json"), "r") as f:
+            table = json.load(f)
+
+        self.fields = table["fields"]
+        self.ids = table["ids"]
+        self.rows = table["rows"]
+        self.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+
+        if len(self.rows) != self.vectors.shape[0]:
+            raise ValueError(
+                f"Snapshot mismatch: {self.vectors.shape[0]} vectors, {len(self.rows)} payload rows"
+            )
+        self._columns = {}  # Payload field -> object array, built on first filter use
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def payload(self, row):
+        # The table stores absent fields as null; drop them as Qdrant would
+        return {field: value for field, value in zip(self.fields, self.rows[row]) if value is not None}
+
+    def column(self, field):
+        if field not in self._columns:
+            index = self.fields.index(field)
+            self._columns[field] = np.array([row[index] for row in self.rows], dtype=object)
+        return self._columns[field]
+
+    def filter_mask(self, query_filter):
+        """
+        Rows matching a Qdrant filter, as a boolean array (None: no filter).
+        Supports "must" conditions with match value/any and range, the subset
+        search_filters.to_qdrant_filter produces.
+        """
+        if query_filter is None:
+            return None
+        if hasattr(query_filter, "model_dump"):  # qdrant_client.models.Filter
+            query_filter = query_filter.model_dump(exclude_none=True)
+
+        mask = np.ones(len(self), dtype=bool)
+        for condition in query_filter.get("must", []):
+            column = self.column(condition["key"])
+            if "match" in condition:
+                match = condition["match"]
+                values = [match["value"]] if "value" in match else match["any"]
+                mask &= np.isin(column, values)
+            elif "range" in condition:
+                bounds = condition["range"]
+                low, high = bounds.get("gte", float("-inf")), bounds.get("lte", float("inf"))
+                mask &= np.fromiter((v is not None and low <= v <= high for v in column), bool, len(column))
+            else:
+                raise ValueError(f"Unsupported filter condition: {condition}")
+        return mask
+
+    def scores(self, query_vector):
+        """Cosine similarity of the query against every row"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.vectors[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32, copy=False) @ query
+        return out
+
+    def top_k(self, scores, limit):
+        """Row indices of the highest scores, best first"""
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, limit - 1)[:limit]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def ranked(self, query_vector, limit, mask=None):
+        """
+        Best rows for a query and their cosine scores, best first.
+
+        Args:
+            mask: boolean array of rows allowed by a filter, or None
+
+        Returns:
+            tuple: (row indices, scores) as numpy arrays
+        """
+        scores = self.scores(query_vector)
+        if mask is not None:
+            scores[~mask] = -np.inf
+            limit = min(limit, int(mask.sum()))
+        rows = self.top_k(scores, limit)
+        return rows, scores[rows]
+
+    def group_pool(self, limit, group_size):
+        """Rows considered when grouping; the exact index can afford all of them"""
+        return len(self)
+
+    def hit(self, row, score):
+        return SimpleNamespace(id=self.ids[row], score=float(score), payload=self.payload(row))
+
+    def search(self, collection_name=None, query_vector=None, limit=10, with_payload=True,
+               query_filter=None, **kwargs):
+        rows, scores = self.ranked(query_vector, limit, self.filter_mask(query_filter))
+        return [self.hit(row, score) for row, score in zip(rows, scores)]
+
+    def search_batch(self, collection_name=None, requests=(), **kwargs):
+        return [
+            self.search(query_vector=request.vector, limit=request.limit, query_filter=request.filter)
+            for request in requests
+        ]
+
+    def search_groups(self, collection_name=None, query_vector=None, group_by="ticker",
+                      limit=10, group_size=1, with_payload=True, query_filter=None, **kwargs):
+        rows, scores = self.ranked(
+            query_vector, self.group_pool(limit, group_size), self.filter_mask(query_filter)
+        )
+        column = self.fields.index(group_by)
+        groups = {}  # Rows are visited best first, so insertion order is group rank
+        full = 0
+
+        for row, score in zip(rows, scores):
+            key = self.rows[row][column]
+            if key is None or (key not in groups and len(groups) >= limit):
+                continue
+            hits = groups.setdefault(key, [])
+            if len(hits) < group_size:
+                hits.append(self.hit(row, score))
+                if len(hits) == group_size:
+                    full += 1
+            if full >= limit:
+                break
+
+        return SimpleNamespace(groups=[SimpleNamespace(id=key, hits=hits) for key, hits in groups.items()])
+
+
+class QuantizedIndex(LocalIndex):
+    """
+    LocalIndex scoring on an int8 matrix with per-dimension scales.
+
+    The top limit * rescore_factor candidates by approximate score are
+    rescored against the full-precision memory-mapped rows.
+    """
+
+    def __init__(self, directory, rescore_factor=RESCORE_FACTOR):
+        super().__init__(directory)
+        self.rescore_factor = rescore_factor
+        self.quantized = np.load(os.path.join(directory, "vectors_int8.npy"))
+        self.scales = np.load(os.path.join(directory, "scales.npy")).astype(np.float32)
+
+        if self.quantized.shape != self.vectors.shape:
+            raise ValueError(
+                f"Snapshot mismatch: int8 matrix {self.quantized.shape}, vectors {self.vectors.shape}"
+            )
+
+    def approximate_scores(self, query_vector):
+        """Cosine similarity estimated from the int8 matrix"""
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scaled_query = query * self.scales
+
+        out = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = self.quantized[start:start + BLOCK_ROWS]
+            out[start:start + len(block)] = block.astype(np.float32) @ scaled_query
+        return out
+
+    def ranked(self, query_vector, limit, mask=None):
+        approximate = self.approximate_scores(query_vector)
+        pool = limit * self.rescore_factor
+        if mask is not None:
+            approximate[~mask] = -np.inf
+            pool = min(pool, int(mask.sum()))
+        candidates = self.top_k(approximate, pool)
+        candidates.sort()  # Sequential reads from the memory-mapped rows
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        exact = self.vectors[candidates].astype(np.float32) @ query
+
+        order = np.argsort(-exact, kind="stable")[:limit]
+        return candidates[order], exact[order]
+
+    def group_pool(self, limit, group_size):
+        return min(len(self), limit * group_size * self.rescore_factor)
@@ -0,0 +1,129 @@
+"""
+Splits long articles into query pieces and fuses per-piece search results.
+
+Splitting mirrors manual/chunking.py (paragraphs packed up to MAX_TOKENS with
+one paragraph of overlap) so query pieces are the same shape as the indexed
+10-K chunks. tiktoken is used for counting when it is installed; otherwise
+tokens are estimated from character length, which is plenty for packing.
+"""
+
+import re
+
+MAX_TOKENS = 1000
+OVERLAP_TOKENS = 100
+MIN_PARAGRAPH_LENGTH = 50
+CHARS_PER_TOKEN = 4  # Estimate used when tiktoken is unavailable
+RRF_K = 60  # Standard reciprocal rank fusion constant
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Count tokens with cl100k_base if available, else estimate"""
+    global _encoding
+
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def normalize_text(text):
+    """Normalize newlines and whitespace"""
+    text = text.replace('\r\n', '\n')
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def split_paragraphs(text):
+    """
+    Split on double newlines. Articles scraped as a single block are split
+    on sentence ends instead so they can still be packed.
+    """
+    paragraphs = [p.strip() for p in text.split('\n\n')]
+    if len(paragraphs) == 1:
+        paragraphs = [p.strip() for p in re.split(r'(?<=[.!?])\s+', text)]
+    return [p for p in paragraphs if len(p) >= MIN_PARAGRAPH_LENGTH] or [text]
+
+
+def create_chunks(paragraphs, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    """Combine paragraphs into chunks up to max_tokens with one paragraph of overlap"""
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+
+    for para in paragraphs:
+        para_tokens = count_tokens(para)
+
+        if current_tokens + para_tokens > max_tokens and current_chunk:
+            chunks.append('\n\n'.join(current_chunk))
+
+            overlap_text = current_chunk[-1]
+            overlap_size = count_tokens(overlap_text)
+
+            if overlap_size < overlap_tokens:
+                current_chunk = [overlap_text, para]
+                current_tokens = overlap_size + para_tokens
+            else:
+                current_chunk = [para]
+                current_tokens = para_tokens
+        else:
+            current_chunk.append(para)
+            current_tokens += para_tokens
+
+    if current_chunk:
+        chunks.append('\n\n'.join(current_chunk))
+
+    return chunks
+
+
+def split_query(content, max_pieces):
+    """
+    Split article content into at most max_pieces query pieces.
+
+    When the article yields more pieces than allowed, an evenly spaced subset
+    is kept so the end of the article is still represented.
+    """
+    pieces = create_chunks(split_paragraphs(normalize_text(content)))
+    if len(pieces) <= max_pieces:
+        return pieces
+
+    step = (len(pieces) - 1) / (max_pieces - 1) if max_pieces > 1 else 0
+    return [pieces[round(i * step)] for i in range(max_pieces)]
+
+
+def fuse_results(result_lists, limit, method="rrf"):
+    """
+    Fuse per-piece hit lists into one ranking, deduplicated by chunk_id.
+
+    Args:
+        result_lists: one list of scored hits per query piece, best first
+        limit: number of fused hits to return
+        method: "rrf" (reciprocal rank fusion) or "max" (best cosine score)
+
+    Returns:
+        list: (hit, fused_score) pairs, best first. The hit kept for each
+        chunk is the one with the highest cosine score.
+    """
+    best_hits = {}
+    fused = {}
+
+    for hits in result_lists:
+        for rank, hit in enumerate(hits):
+            key = hit.payload.get("chunk_id") or hit.id
+            if key not in best_hits or hit.score > best_hits[key].score:
+                best_hits[key] = hit
+
+            if method == "rrf":
+                fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            else:
+                fused[key] = max(fused.get(key, float("-inf")), hit.score)
+
+    ranked = sorted(fused, key=lambda key: fused[key], reverse=True)[:limit]
+    return [(best_hits[key], fused[key]) for key in ranked]
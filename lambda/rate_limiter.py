@@ -0,0 +1,125 @@
+"""
+Sliding-window rate limiter for requests and tokens.
+
+Shared by the Lambda handler, the embedding pipeline (Voyage RPM + TPM) and
+the SEC extractor (requests per second). This is the only copy: it lives in
+the Lambda bundle, which is deployed on its own, and the manual/ scripts add
+this directory to sys.path to import it.
+
+Each admitted request is recorded once in a deque and evicted once when it
+leaves the window, so a call is O(1) amortised. The lock is only held for
+that bookkeeping, never while waiting, so one limiter can be shared by
+threads and by coroutines (acquire_async) at the same time.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class RateLimitExceeded(Exception):
+    """A request could not be admitted within the caller's timeout"""
+
+
+class RateLimiter:
+    """
+    Admits a request only if, within the trailing `period` seconds, both the
+    request count stays within max_requests and the token total within
+    max_tokens. Either limit may be None. A single request larger than
+    max_tokens is admitted once the window is otherwise empty.
+    """
+
+    def __init__(self, max_requests=None, max_tokens=None, period=60.0, clock=time.monotonic):
+        self.max_requests = max_requests
+        self.max_tokens = max_tokens
+        self.period = period
+        self.clock = clock
+        self.log = deque()  # (admitted_at, tokens), oldest first
+        self.window_tokens = 0
+        self.blocked_until = 0.0  # Set from server Retry-After hints
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens=0):
+        """
+        Admit a request now if it fits, without blocking.
+
+        Returns:
+            float: 0 if admitted, otherwise seconds until it may fit
+        """
+        with self.lock:
+            now = self.clock()
+            while self.log and now - self.log[0][0] >= self.period:
+                self.window_tokens -= self.log.popleft()[1]
+
+            if now < self.blocked_until:
+                return self.blocked_until - now
+
+            within_requests = self.max_requests is None or len(self.log) < self.max_requests
+            within_tokens = (self.max_tokens is None or not self.log or
+                             self.window_tokens + tokens <= self.max_tokens)
+            if within_requests and within_tokens:
+                self.log.append((now, tokens))
+                self.window_tokens += tokens
+                return 0.0
+
+            # The oldest entry leaving the window is the earliest anything changes
+            return max(self.log[0][0] + self.period - now, 1e-3)
+
+    def acquire(self, tokens=0, timeout=None):
+        """
+        Block until the request is admitted.
+
+        Args:
+            tokens: tokens the request will consume
+            timeout: give up after this many seconds (None waits indefinitely)
+
+        Returns:
+            float: seconds spent waiting, or None if timeout ran out first
+        """
+        waited = 0.0
+        while (wait := self.reserve(tokens)) > 0:
+            if timeout is not None and waited + wait > timeout:
+                return None
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def acquire_async(self, tokens=0, timeout=None):
+        """acquire for coroutines: waits with asyncio.sleep instead of blocking the loop"""
+        import asyncio  # Only paid for by async callers; keeps Lambda cold starts lean
+
+        waited = 0.0
+        while (wait := self.reserve(tokens)) > 0:
+            if timeout is not None and waited + wait > timeout:
+                return None
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    def backoff(self, seconds):
+        """Admit nothing for the next `seconds`, e.g. after a 429 with Retry-After"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+
+def retry_after_seconds(error):
+    """
+    Seconds from the Retry-After header of an HTTP error, if it carries one.
+
+    Works for voyageai errors and rest_clients.RestError, which both expose
+    response headers as `headers`. Accepts delta-seconds and HTTP-date forms.
+    """
+    headers = getattr(error, "headers", None) or {}
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    if value is None:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,153 @@
+"""
+Minimal REST clients for Voyage and Qdrant.
+
+They implement only the calls the handler makes, with the same method names
+and result shapes as voyageai.Client and QdrantClient, using nothing but the
+standard library. Selected with CLIENT_MODE=rest to keep the grpc/pydantic
+stacks out of cold starts.
+"""
+
+import http.client
+import json
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+VOYAGE_API_URL = "https://api.voyageai.com/v1"
+
+
+class SearchRequest:
+    """Stand-in for qdrant_client.models.SearchRequest"""
+
+    def __init__(self, vector, limit, with_payload=True, filter=None):
+        self.vector = vector
+        self.limit = limit
+        self.with_payload = with_payload
+        self.filter = filter
+
+    def to_json(self):
+        return _search_body(self.vector, self.limit, self.with_payload, self.filter)
+
+
+class RestError(Exception):
+    """Non-2xx response from a REST API"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.headers = headers or {}  # Read for Retry-After by rate_limiter.retry_after_seconds
+
+
+class JsonHttpClient:
+    """
+    JSON-over-HTTPS with one kept-alive connection per client, so warm
+    invocations skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, base_url, headers, timeout=10):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.headers = {"Content-Type": "application/json", **headers}
+        self.timeout = timeout
+        self._conn = None
+
+    def _connect(self):
+        conn_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def post(self, path, body):
+        payload = json.dumps(body)
+        # One retry covers a kept-alive connection the server has since closed
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.request("POST", self.base_path + path, body=payload, headers=self.headers)
+                response = self._conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()
+                self._conn = None
+                if attempt == 1:
+                    raise
+
+        if not 200 <= response.status < 300:
+            raise RestError(response.status, data.decode("utf-8", "replace")[:500], dict(response.getheaders()))
+        return json.loads(data)
+
+
+class VoyageRestClient:
+    """voyageai.Client.embed over plain HTTPS"""
+
+    def __init__(self, api_key, base_url=VOYAGE_API_URL, timeout=10):
+        self.http = JsonHttpClient(base_url, {"Authorization": f"Bearer {api_key}"}, timeout)
+
+    def embed(self, texts, model, input_type=None):
+        if isinstance(texts, str):
+            texts = [texts]
+        body = {"input": texts, "model": model}
+        if input_type:
+            body["input_type"] = input_type
+
+        response = self.http.post("/embeddings", body)
+        data = sorted(response["data"], key=lambda item: item["index"])
+        return SimpleNamespace(
+            embeddings=[item["embedding"] for item in data],
+            total_tokens=response.get("usage", {}).get("total_tokens", 0),
+        )
+
+
+class QdrantRestClient:
+    """The subset of QdrantClient used by the handler, over plain HTTPS"""
+
+    def __init__(self, url, api_key, timeout=10):
+        self.http = JsonHttpClient(url, {"api-key": api_key}, timeout)
+
+    def search(self, collection_name, query_vector, limit=10, with_payload=True, query_filter=None):
+        response = self.http.post(
+            f"/collections/{collection_name}/points/search",
+            _search_body(query_vector, limit, with_payload, query_filter),
+        )
+        return [_scored_point(hit) for hit in response["result"]]
+
+    def search_batch(self, collection_name, requests):
+        response = self.http.post(
+            f"/collections/{collection_name}/points/search/batch",
+            {"searches": [request.to_json() for request in requests]},
+        )
+        return [[_scored_point(hit) for hit in hits] for hits in response["result"]]
+
+    def search_groups(self, collection_name, query_vector, group_by, limit=10, group_size=1,
+                      with_payload=True, query_filter=None):
+        body = _search_body(query_vector, limit, with_payload, query_filter)
+        body.update({"group_by": group_by, "group_size": group_size})
+        response = self.http.post(f"/collections/{collection_name}/points/search/groups", body)
+        return SimpleNamespace(groups=[
+            SimpleNamespace(id=group["id"], hits=[_scored_point(hit) for hit in group["hits"]])
+            for group in response["result"]["groups"]
+        ])
+
+    def retrieve(self, collection_name, ids, with_payload=True):
+        response = self.http.post(
+            f"/collections/{collection_name}/points",
+            {"ids": ids, "with_payload": with_payload},
+        )
+        return [_scored_point(record) for record in response["result"]]
+
+
+def _search_body(vector, limit, with_payload, query_filter):
+    body = {"vector": vector, "limit": limit, "with_payload": with_payload}
+    if query_filter is not None:
+        body["filter"] = query_filter
+    return body
+
+
+def _scored_point(point):
+    return SimpleNamespace(
+        id=point.get("id"),
+        score=point.get("score"),
+        payload=point.get("payload") or {},
+    )
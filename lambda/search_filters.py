@@ -0,0 +1,101 @@
+"""
+Request-level search filters.
+
+A request may restrict matches with a "filters" object over payload fields
+that embed_and_ingest.py builds indexes for:
+
+    {"section": "item1a", "industry": ["Semiconductors", "Software"],
+     "sic_code": "3674", "fiscal_year": {"gte": 2023, "lte": 2025}}
+
+Keyword fields take a string or a list of strings (any may match);
+fiscal_year takes an integer, a list of integers or a gte/lte range. Fields
+are combined with AND. parse_filters validates a request and returns its
+canonical form (sorted fields, sorted de-duplicated values), which is also
+what goes into the result cache key, so equivalent filters share entries.
+"""
+
+KEYWORD_FIELDS = ("section", "industry", "sic_code")
+INTEGER_FIELDS = ("fiscal_year",)
+MAX_FILTER_VALUES = 50
+RANGE_BOUNDS = ("gte", "lte")
+
+
+def parse_filters(raw):
+    """
+    Validate request filters.
+
+    Raises:
+        ValueError: on an unsupported field or a malformed value
+
+    Returns:
+        dict: canonical filters, or None when there is nothing to filter on
+    """
+    if raw is None:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("filters must be an object")
+
+    canonical = {}
+    for field, value in raw.items():
+        if field in KEYWORD_FIELDS:
+            canonical[field] = _keyword_values(field, value)
+        elif field in INTEGER_FIELDS:
+            canonical[field] = _integer_condition(field, value)
+        else:
+            supported = ", ".join(KEYWORD_FIELDS + INTEGER_FIELDS)
+            raise ValueError(f"Unsupported filter field '{field}' (supported: {supported})")
+    return dict(sorted(canonical.items())) or None
+
+
+def _values(field, value, kind):
+    values = value if isinstance(value, list) else [value]
+    if not 1 <= len(values) <= MAX_FILTER_VALUES:
+        raise ValueError(f"{field} takes between 1 and {MAX_FILTER_VALUES} values")
+    if not all(_is_kind(v, kind) for v in values):
+        raise ValueError(f"{field} must be {'a string' if kind is str else 'an integer'} or a list of them")
+    return sorted(set(values))
+
+
+def _is_kind(value, kind):
+    if kind is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, str) and value != ""
+
+
+def _keyword_values(field, value):
+    return _values(field, value, str)
+
+
+def _integer_condition(field, value):
+    if not isinstance(value, dict):
+        return _values(field, value, int)
+
+    if not value or set(value) - set(RANGE_BOUNDS):
+        raise ValueError(f"{field} range takes 'gte' and/or 'lte'")
+    if not all(_is_kind(bound, int) for bound in value.values()):
+        raise ValueError(f"{field} range bounds must be integers")
+    if value.get("gte", float("-inf")) > value.get("lte", float("inf")):
+        raise ValueError(f"{field} range is empty (gte > lte)")
+    return {bound: value[bound] for bound in RANGE_BOUNDS if bound in value}
+
+
+def to_qdrant_filter(filters):
+    """
+    Qdrant filter for canonical filters, in REST JSON form
+    (qdrant_client.models.Filter.model_validate accepts it as is).
+
+    Returns:
+        dict or None
+    """
+    if not filters:
+        return None
+
+    must = []
+    for field, condition in filters.items():
+        if isinstance(condition, dict):
+            must.append({"key": field, "range": condition})
+        elif len(condition) == 1:
+            must.append({"key": field, "match": {"value": condition[0]}})
+        else:
+            must.append({"key": field, "match": {"any": condition}})
+    return {"must": must}
@@ -3,26 +3,49 @@
 """
 
 import json
+import sys
 import time
+import argparse
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from edgar import Company, set_identity
 import pandas as pd
 
+# Single copy of the rate limiter, shipped in the Lambda bundle
+sys.path.append(str(Path(__file__).resolve().parent.parent / "lambda"))
+from rate_limiter import RateLimiter
+
 SCRIPT_DIR = Path(__file__).parent
 SUMMARY_DIR = SCRIPT_DIR / "data"
 OUTPUT_DIR = SCRIPT_DIR / "data" / "extracted_10k"
+MANIFEST_FILE = SCRIPT_DIR / "data" / "_extraction_manifest.json" # ticker -> latest extracted accession
 
 MIN_CHARS = 500 # QA check
 SECTIONS = ["item1", "item1a"]
 SEC_BASE_URL = "https://www.sec.gov/cgi-bin/viewer"
+SEC_REQUESTS_PER_SECOND = 8 # SEC fair access limit is 10/s; edgar calls can issue more than one request
+DEFAULT_WORKERS = 8
+
+
+# Shared by all extraction workers: no one-second window sees more than the rate
+sec_limiter = RateLimiter(max_requests=SEC_REQUESTS_PER_SECOND, period=1.0)
+
 
+def latest_filing(ticker: str):
+    """Resolve the latest 10-K from the filing index only, without downloading it"""
+    sec_limiter.acquire()
+    company = Company(ticker)
+    sec_limiter.acquire()
+    filings = company.get_filings(form="10-K", amendments=False)
+    return company, filings.latest()
 
-def extract_company(ticker: str) -> dict:
+
+def extract_company(ticker: str, company=None, filing=None) -> dict:
     try:
-        company = Company(ticker)
-        filings = company.get_filings(form="10-K", amendments=False)
-        filing = filings.latest()
+        if filing is None:
+            company, filing = latest_filing(ticker)
+        sec_limiter.acquire()
         tenk = filing.obj()
     
         sections = {}
@@ -87,36 +110,113 @@ def save_result(data: dict):
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
-def process_tickers(tickers: list):
+def load_manifest() -> dict:
+    """
+    Load the ticker -> latest extracted filing manifest. On first use it is
+    rebuilt from the fully extracted files already in OUTPUT_DIR.
+    """
+    if MANIFEST_FILE.exists():
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+
+    manifest = {}
+    for path in sorted(Path(OUTPUT_DIR).glob("*.json")):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if sections_extracted(data) < len(SECTIONS):
+            continue
+        known = manifest.get(data['ticker'])
+        if known is None or data['filing_date'] > known['filing_date']:
+            manifest[data['ticker']] = manifest_entry(data)
+    print(f"Built manifest from {len(manifest)} extracted files")
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = MANIFEST_FILE.with_suffix(".tmp")
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_file.replace(MANIFEST_FILE)
+
+
+def sections_extracted(data: dict) -> int:
+    return sum(1 for s in data['sections'].values() if s['text'] is not None)
+
+
+def manifest_entry(data: dict) -> dict:
+    return {
+        "accession_number": data['accession_number'],
+        "filing_date": data['filing_date'],
+        "file": f"{data['ticker']}_{data['filing_date']}.json"
+    }
+
+
+def process_ticker(ticker: str, manifest: dict, incremental: bool = False) -> tuple[str, str]:
+    """
+    Extract and save one ticker.
+    In incremental mode only the filing index is fetched when the latest
+    accession is already in the manifest.
+
+    Returns:
+        (outcome, status text), outcome being "ok", "skipped" or "failed"
+    """
+    try:
+        company, filing = latest_filing(ticker)
+    except Exception as e:
+        print(f"FAILED {ticker}: {str(e)}")
+        return "failed", "Failed"
+
+    known = manifest.get(ticker)
+    if incremental and known and known['accession_number'] == filing.accession_number:
+        return "skipped", f"unchanged ({filing.accession_number})"
+
+    result = extract_company(ticker, company, filing)
+    if not result:
+        return "failed", "Failed"
+
+    save_result(result)
+    section_success = sections_extracted(result)
+    outcome = "ok" if section_success == len(SECTIONS) else "failed"
+    if outcome == "ok":
+        # A partial extraction stays out of the manifest so --incremental retries it
+        manifest[ticker] = manifest_entry(result)
+    return outcome, f"({section_success}/{len(SECTIONS)} sections)"
+
+
+def process_tickers(tickers: list, workers: int = DEFAULT_WORKERS, incremental: bool = False):
     successful = 0
+    skipped = 0
     failed = []
-    print(f"Processing {len(tickers)} companies...")
+    manifest = load_manifest()
+    print(f"Processing {len(tickers)} companies with {workers} workers{' (incremental)' if incremental else ''}...")
     print(f"Output directory: {OUTPUT_DIR}\n")
 
-    for i, ticker in enumerate(tickers, 1):
-        print(f"[{i}/{len(tickers)}] {ticker}...", end=" ")
-        result = extract_company(ticker)
-        if result:
-            save_result(result)
-            section_success = sum(
-                1 for s in result['sections'].values()
-                if s['text'] is not None
-            )
-    
-            if section_success == len(SECTIONS):
-                print(f"({section_success}/{len(SECTIONS)} sections)")
+    # SEC rate limiting is enforced across all workers by sec_limiter
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_ticker, ticker, manifest, incremental): ticker
+            for ticker in tickers
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            ticker = futures[future]
+            try:
+                outcome, status = future.result()
+            except Exception as e:
+                outcome, status = "failed", f"Failed - {str(e)}"
+            print(f"[{i}/{len(tickers)}] {ticker}... {status}")
+            if outcome == "ok":
                 successful += 1
+            elif outcome == "skipped":
+                skipped += 1
             else:
-                print(f"({section_success}/{len(SECTIONS)} sections)")
                 failed.append(ticker)
-        else:
-            print("Failed")
-            failed.append(ticker)
-        
-        time.sleep(0.15) # SEC rate limiting
+
+    save_manifest(manifest)
         
     print("EXTRACTION COMPLETE")
     print(f"Successful: {successful}/{len(tickers)}")
+    print(f"Unchanged (skipped): {skipped}")
     print(f"Failed: {len(failed)}")
     if failed:
         print(f"\nFailed tickers:")
@@ -128,12 +228,18 @@ def process_tickers(tickers: list):
     return {
         "total": len(tickers),
         "successful": successful,
+        "skipped": skipped,
         "failed": len(failed),
         "failed_tickers": failed
     }
 
 
 def main():
+    parser = argparse.ArgumentParser(description="10-K extractor (items 1 and 1A)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Concurrent extraction workers")
+    parser.add_argument("--incremental", action="store_true", help="Only download filings newer than the manifest")
+    args = parser.parse_args()
+
     print(f"Ingesting tickers_sample_500.csv")
     csv_path = SCRIPT_DIR / 'tickers_sample_500.csv'
     df = pd.read_csv(csv_path)
@@ -147,7 +253,7 @@ def main():
     
     print(f"\nStarting backfill at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     start_time = time.time()
-    summary = process_tickers(tickers)
+    summary = process_tickers(tickers, workers=args.workers, incremental=args.incremental)
     elapsed = time.time() - start_time
     print(f"Total runtime: {elapsed/60:.1f} minutes")
     
@@ -0,0 +1,98 @@
+"""
+Chunking throughput benchmark: single-pass tokenization vs the previous
+implementation, which encoded each paragraph, the overlap paragraph and
+then every joined chunk again.
+
+Both run over the same extracted 10-K sections; chunks (text and
+token_count) must match exactly. Throughput is reported as output tokens/sec.
+
+Usage:
+    python benchmark_chunking.py [--files 100]
+"""
+
+import argparse
+import glob
+import json
+import time
+
+from chunking import (
+    INPUT_DIR, MAX_TOKENS, OVERLAP_TOKENS,
+    count_tokens, create_chunks, normalize_text, split_paragraphs,
+)
+
+
+def legacy_create_chunks(paragraphs: list[str],
+                         max_tokens: int = MAX_TOKENS,
+                         overlap_tokens: int = OVERLAP_TOKENS) -> list[tuple[str, int]]:
+    """The previous create_chunks plus create_chunk_dict's token_count re-encode"""
+    chunks = []
+    current_chunk = []
+    current_tokens = 0
+
+    for para in paragraphs:
+        para_tokens = count_tokens(para)
+
+        if current_tokens + para_tokens > max_tokens and current_chunk:
+            chunks.append('\n\n'.join(current_chunk))
+
+            overlap_text = current_chunk[-1]
+            overlap_size = count_tokens(overlap_text)
+
+            if overlap_size < overlap_tokens:
+                current_chunk = [overlap_text, para]
+                current_tokens = overlap_size + para_tokens
+            else:
+                current_chunk = [para]
+                current_tokens = para_tokens
+        else:
+            current_chunk.append(para)
+            current_tokens += para_tokens
+
+    if current_chunk:
+        chunks.append('\n\n'.join(current_chunk))
+
+    return [(chunk, count_tokens(chunk)) for chunk in chunks]
+
+
+def load_sections(limit: int) -> list[list[str]]:
+    """Paragraph lists for every non-empty section of the first `limit` files"""
+    sections = []
+    for json_file in sorted(glob.glob(str(INPUT_DIR / "*.json")))[:limit]:
+        with open(json_file, 'r') as f:
+            data = json.load(f)
+        for section in data['sections'].values():
+            if section.get('text'):
+                sections.append(split_paragraphs(normalize_text(section['text'])))
+    return sections
+
+
+def run(chunker, sections: list[list[str]]) -> tuple[list, float]:
+    start = time.perf_counter()
+    chunks = [chunker(paragraphs) for paragraphs in sections]
+    return chunks, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking throughput benchmark")
+    parser.add_argument("--files", type=int, default=100, help="Extracted files to chunk")
+    args = parser.parse_args()
+
+    sections = load_sections(args.files)
+    print(f"Sections: {len(sections)} from {args.files} files\n")
+
+    legacy_chunks, legacy_time = run(legacy_create_chunks, sections)
+    chunks, new_time = run(create_chunks, sections)
+
+    if chunks != legacy_chunks:
+        mismatches = sum(a != b for a, b in zip(chunks, legacy_chunks))
+        raise SystemExit(f"Output differs from the legacy chunker in {mismatches} sections")
+
+    total_tokens = sum(tokens for section in chunks for _, tokens in section)
+    print(f"Chunks: {sum(len(s) for s in chunks):,} ({total_tokens:,} tokens), identical output")
+    print(f"{'legacy':<14} {legacy_time:7.2f}s  {total_tokens / legacy_time:12,.0f} tokens/sec")
+    print(f"{'single-pass':<14} {new_time:7.2f}s  {total_tokens / new_time:12,.0f} tokens/sec")
+    print(f"Speedup: {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,15 @@
 10-K chunking script
 """
 
+import os
 import json
 import re
+import hashlib
 import glob
+import argparse
+from bisect import bisect_left
+from functools import partial
+from multiprocessing import Pool
 from pathlib import Path
 from datetime import datetime
 import tiktoken
@@ -13,12 +19,18 @@ SCRIPT_DIR = Path(__file__).parent
 INPUT_DIR = SCRIPT_DIR / "data" / "extracted_10k"
 OUTPUT_FILE = SCRIPT_DIR / "data" / "10k_chunks.jsonl"
 ERROR_LOG = SCRIPT_DIR / "data" / "_chunking_errors.json"
+MANIFEST_FILE = SCRIPT_DIR / "data" / "_chunking_manifest.json" # Per-file hashes and output ranges
+DELTA_FILE = SCRIPT_DIR / "data" / "10k_chunks_delta.json" # Chunk ids added/changed/removed by the last run
 
 MAX_TOKENS = 1000
 OVERLAP_TOKENS = 100
 MIN_PARAGRAPH_LENGTH = 50
+PARAGRAPH_SEPARATOR = '\n\n'
+SENTENCE_GAP = re.compile(r'(?<=[.!?])["\')\u201d]?\s+|\n\n') # Whitespace after a sentence or paragraph end
 
 encoding = tiktoken.get_encoding("cl100k_base") # Initialise tokeniser (Voyage Finance-2 uses cl100k_base encoding)
+tokenizer_threads = os.cpu_count() or 1 # Threads per batch encode; 1 inside --workers processes
+SEPARATOR_TOKENS = len(encoding.encode(PARAGRAPH_SEPARATOR))
 
 
 def count_tokens(text: str) -> int:
@@ -26,6 +38,32 @@ def count_tokens(text: str) -> int:
     return len(encoding.encode(text))
 
 
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    """
+    Count tokens for many texts with tiktoken's multi-threaded batch encode.
+    Single-threaded callers (e.g. pool workers) skip the thread pool overhead.
+    """
+    if tokenizer_threads <= 1 or len(texts) < 2:
+        return [count_tokens(text) for text in texts]
+    return [len(ids) for ids in encoding.encode_batch(texts, num_threads=tokenizer_threads)]
+
+
+def join_token_delta(paragraph: str) -> int:
+    """
+    Tokens added by appending PARAGRAPH_SEPARATOR to a stripped paragraph.
+
+    Usually 1, but the separator can merge with trailing punctuation. Only the
+    last pre-token can change, and it starts at or after the last whitespace,
+    so encoding that short tail is exact.
+    """
+    if paragraph[-1].isalnum():
+        # Letters/digits never merge with newlines: the separator is its own pre-token
+        return SEPARATOR_TOKENS
+    tail_start = max(paragraph.rfind(c) for c in ' \t\n')
+    tail = paragraph[max(tail_start, 0):]
+    return count_tokens(tail + PARAGRAPH_SEPARATOR) - count_tokens(tail)
+
+
 def normalize_text(text: str) -> str:
     """Normalize newlines and whitespace"""
     # Windows → Unix
@@ -48,48 +86,121 @@ def split_paragraphs(text: str) -> list[str]:
 
 def create_chunks(paragraphs: list[str], 
                   max_tokens: int = MAX_TOKENS,
-                  overlap_tokens: int = OVERLAP_TOKENS) -> list[str]:
+                  overlap_tokens: int = OVERLAP_TOKENS) -> list[tuple[str, int]]:
     """
     Combine paragraphs into chunks until hitting token limit
     Add overlap between chunks for context continuity
+
+    Paragraphs are tokenized once, in a single batch. Returns
+    (chunk_text, token_count) pairs; token_count is exact for the joined text.
     """
     chunks = []
-    current_chunk = []
+    current_chunk = []  # (paragraph, token count) pairs
     current_tokens = 0
     
-    for para in paragraphs:
-        para_tokens = count_tokens(para)
-        
+    for para, para_tokens in zip(paragraphs, count_tokens_batch(paragraphs)):
         # Would adding this paragraph exceed the limit?
         if current_tokens + para_tokens > max_tokens and current_chunk:
             # Save current chunk
-            chunks.append('\n\n'.join(current_chunk))
+            chunks.append(join_paragraphs(current_chunk))
             
             # Start new chunk with overlap from last paragraph
-            overlap_text = current_chunk[-1]
-            overlap_size = count_tokens(overlap_text)
+            overlap_text, overlap_size = current_chunk[-1]
             
             if overlap_size < overlap_tokens:
                 # Use last paragraph as overlap
-                current_chunk = [overlap_text, para]
+                current_chunk = [(overlap_text, overlap_size), (para, para_tokens)]
                 current_tokens = overlap_size + para_tokens
             else:
                 # Last paragraph too big for overlap, start fresh
-                current_chunk = [para]
+                current_chunk = [(para, para_tokens)]
                 current_tokens = para_tokens
         else:
             # Add paragraph to current chunk
-            current_chunk.append(para)
+            current_chunk.append((para, para_tokens))
             current_tokens += para_tokens
     
     # Don't forget the last chunk
     if current_chunk:
-        chunks.append('\n\n'.join(current_chunk))
+        chunks.append(join_paragraphs(current_chunk))
     
     return chunks
 
 
+def join_paragraphs(parts: list[tuple[str, int]]) -> tuple[str, int]:
+    """Join (paragraph, token count) pairs into chunk text and its exact token count"""
+    text = PARAGRAPH_SEPARATOR.join(para for para, _ in parts)
+    tokens = sum(count for _, count in parts)
+    tokens += sum(join_token_delta(para) for para, _ in parts[:-1])
+    return text, tokens
+
+
+def create_window_chunks(paragraphs: list[str],
+                         max_tokens: int = MAX_TOKENS,
+                         overlap_tokens: int = OVERLAP_TOKENS) -> list[tuple[str, int]]:
+    """
+    Slide a max_tokens window over the section's token ids, so paragraphs
+    larger than the limit are split too. Window ends snap back to the last
+    sentence boundary in the second half of the window. Consecutive windows
+    share overlap_tokens tokens, or at least half that when the overlap can
+    start at a sentence boundary. Every chunk is at most max_tokens.
+
+    Returns (chunk_text, token_count) pairs, like create_chunks.
+    """
+    text = PARAGRAPH_SEPARATOR.join(paragraphs)
+    ids = encoding.encode(text)
+    if not ids:
+        return []
+    _, offsets = encoding.decode_with_offsets(ids)
+    n = len(ids)
+
+    # Token indices that start a sentence (the token may carry the leading space)
+    boundaries = []
+    for match in SENTENCE_GAP.finditer(text):
+        i = bisect_left(offsets, match.start())
+        if i < n and offsets[i] <= match.end() and i > 0 and (not boundaries or boundaries[-1] != i):
+            boundaries.append(i)
+
+    def char_pos(i: int) -> int:
+        return offsets[i] if i < n else len(text)
+
+    chunks = []
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        if end < n:
+            b = bisect_left(boundaries, end + 1) - 1
+            if b >= 0 and boundaries[b] > start + max_tokens // 2:
+                end = boundaries[b]
+
+        chunk_text = text[char_pos(start):char_pos(end)].strip()
+        token_count = count_tokens(chunk_text)
+        while token_count > max_tokens:
+            # Re-encoding a slice can differ by a token at the edges
+            end -= 1
+            chunk_text = text[char_pos(start):char_pos(end)].strip()
+            token_count = count_tokens(chunk_text)
+        if chunk_text:
+            chunks.append((chunk_text, token_count))
+
+        if end >= n:
+            break
+        next_start = max(end - overlap_tokens, start + 1)
+        b = bisect_left(boundaries, next_start)
+        snapped = b < len(boundaries) and boundaries[b] <= end - overlap_tokens // 2
+        start = boundaries[b] if snapped else next_start
+
+    return chunks
+
+
+CHUNK_STRATEGIES = {
+    'paragraph': create_chunks, # Whole paragraphs, one paragraph of overlap
+    'window': create_window_chunks, # Token windows, splits oversized paragraphs
+}
+
+
 def create_chunk_dict(chunk_text: str,
+                     token_count: int,
                      company_data: dict,
                      section: str,
                      chunk_index: int,
@@ -107,15 +218,17 @@ def create_chunk_dict(chunk_text: str,
         'source_url': company_data['source_url'],
         'chunk_index': chunk_index,
         'total_chunks': total_chunks,
-        'token_count': count_tokens(chunk_text)
+        'token_count': token_count,
+        'content_hash': hashlib.sha256(chunk_text.encode('utf-8')).hexdigest()
     }
 
 
-def process_company(data: dict) -> dict:
+def process_company(data: dict, strategy: str = 'paragraph') -> dict:
     """
     Process a single company's 10-K data
     Returns dict with chunk counts and any errors
     """
+    chunker = CHUNK_STRATEGIES[strategy]
     result = {
         'ticker': data['ticker'],
         'item1_chunks': 0,
@@ -130,11 +243,11 @@ def process_company(data: dict) -> dict:
         try:
             item1_text = normalize_text(data['sections']['item1']['text'])
             paragraphs = split_paragraphs(item1_text)
-            chunks = create_chunks(paragraphs)
+            chunks = chunker(paragraphs)
             
-            for i, chunk in enumerate(chunks):
+            for i, (chunk, token_count) in enumerate(chunks):
                 chunk_dict = create_chunk_dict(
-                    chunk, data, 'item1', i, len(chunks)
+                    chunk, token_count, data, 'item1', i, len(chunks)
                 )
                 chunks_created.append(chunk_dict)
             
@@ -147,11 +260,11 @@ def process_company(data: dict) -> dict:
         try:
             item1a_text = normalize_text(data['sections']['item1a']['text'])
             paragraphs = split_paragraphs(item1a_text)
-            chunks = create_chunks(paragraphs)
+            chunks = chunker(paragraphs)
             
-            for i, chunk in enumerate(chunks):
+            for i, (chunk, token_count) in enumerate(chunks):
                 chunk_dict = create_chunk_dict(
-                    chunk, data, 'item1a', i, len(chunks)
+                    chunk, token_count, data, 'item1a', i, len(chunks)
                 )
                 chunks_created.append(chunk_dict)
             
@@ -163,7 +276,67 @@ def process_company(data: dict) -> dict:
     return result
 
 
-def process_all_files():
+def process_file(json_file: str, strategy: str = 'paragraph') -> dict:
+    """
+    Chunk one extracted JSON file. Runs in worker processes, so chunks come
+    back already serialized as JSONL lines.
+    """
+    try:
+        with open(json_file, 'r') as jf:
+            data = json.load(jf)
+        result = process_company(data, strategy)
+        chunks = result.pop('chunks')
+        result['lines'] = [json.dumps(chunk) + '\n' for chunk in chunks]
+        result['chunk_hashes'] = {chunk['chunk_id']: chunk['content_hash'] for chunk in chunks}
+        return result
+    except Exception as e:
+        return {'file_error': str(e)}
+
+
+def _init_worker():
+    """Pool initializer: the processes already use the cores, so no tokenizer threads"""
+    global tokenizer_threads
+    tokenizer_threads = 1
+
+
+def file_sha256(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def chunking_params(strategy: str) -> dict:
+    """Everything besides the input that determines the output"""
+    return {
+        'strategy': strategy,
+        'max_tokens': MAX_TOKENS,
+        'overlap_tokens': OVERLAP_TOKENS,
+        'min_paragraph_length': MIN_PARAGRAPH_LENGTH,
+    }
+
+
+def load_manifest() -> dict:
+    if MANIFEST_FILE.exists():
+        with open(MANIFEST_FILE, 'r') as f:
+            return json.load(f)
+    return {'params': None, 'files': {}}
+
+
+def write_delta(old_files: dict, new_files: dict) -> dict:
+    """Write chunk ids added, changed (new content_hash) and removed since the previous run"""
+    old_hashes = {cid: h for entry in old_files.values() for cid, h in entry['chunks'].items()}
+    new_hashes = {cid: h for entry in new_files.values() for cid, h in entry['chunks'].items()}
+    delta = {
+        'added': [cid for cid in new_hashes if cid not in old_hashes],
+        'changed': [cid for cid, h in new_hashes.items() if cid in old_hashes and old_hashes[cid] != h],
+        'removed': [cid for cid in old_hashes if cid not in new_hashes],
+        'generated_at': datetime.now().isoformat()
+    }
+    with open(DELTA_FILE, 'w') as f:
+        json.dump(delta, f, indent=2)
+    return delta
+
+
+def process_all_files(workers: int = 1, strategy: str = 'paragraph', incremental: bool = False):
     json_files = sorted(glob.glob(str(INPUT_DIR / "*.json")))
     
     if not json_files:
@@ -171,49 +344,108 @@ def process_all_files():
         return
     
     print(f"Found {len(json_files)} files to process")
+    print(f"Workers: {workers}")
+    print(f"Strategy: {strategy}")
     print(f"Output: {OUTPUT_FILE}\n")
     
     # Create output directory if needed
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     
+    # Files whose content and chunking parameters are unchanged since the last
+    # run are copied from the previous output by byte range instead of re-chunked
+    manifest = load_manifest()
+    file_hashes = {json_file: file_sha256(json_file) for json_file in json_files}
+    reusable = {}
+    if incremental and manifest['params'] == chunking_params(strategy) and OUTPUT_FILE.exists():
+        for json_file in json_files:
+            entry = manifest['files'].get(Path(json_file).name)
+            if entry and entry['sha256'] == file_hashes[json_file]:
+                reusable[json_file] = entry
+    to_chunk = [json_file for json_file in json_files if json_file not in reusable]
+    if incremental:
+        print(f"Unchanged: {len(reusable)}, to chunk: {len(to_chunk)}\n")
+    
     total_chunks = 0
     successful = 0
     errors = []
+    new_files = {}
     
-    with open(OUTPUT_FILE, 'w') as f:
-        for i, json_file in enumerate(json_files, 1):
-            try:
-                # Load company data
-                with open(json_file, 'r') as jf:
-                    data = json.load(jf)
+    pool = Pool(workers, initializer=_init_worker) if workers > 1 else None
+    # imap yields results in input order, so the output is identical for any worker count
+    chunk_file = partial(process_file, strategy=strategy)
+    results = pool.imap(chunk_file, to_chunk) if pool else map(chunk_file, to_chunk)
+    
+    tmp_output = OUTPUT_FILE.with_suffix('.jsonl.tmp')
+    previous = open(OUTPUT_FILE, 'rb') if reusable else None
+    
+    try:
+        with open(tmp_output, 'wb') as f:
+            for i, json_file in enumerate(json_files, 1):
+                name = Path(json_file).name
+                offset = f.tell()
                 
-                # Process company
-                result = process_company(data)
+                if json_file in reusable:
+                    entry = reusable[json_file]
+                    previous.seek(entry['offset'])
+                    f.write(previous.read(entry['length']))
+                    new_files[name] = {**entry, 'offset': offset}
+                    total_chunks += len(entry['chunks'])
+                    print(f"[{i}/{len(json_files)}] {entry['ticker']}: {len(entry['chunks'])} chunks (unchanged)")
+                    if entry.get('errors'):
+                        errors.append({'ticker': entry['ticker'], 'file': json_file, 'errors': entry['errors']})
+                    else:
+                        successful += 1
+                    continue
+                
+                result = next(results)
+                if 'file_error' in result:
+                    print(f"[{i}/{len(json_files)}] {Path(json_file).stem}: FAILED - {result['file_error']}")
+                    errors.append({
+                        'file': json_file,
+                        'error': result['file_error']
+                    })
+                    continue
                 
                 # Write chunks to JSONL
-                for chunk in result['chunks']:
-                    f.write(json.dumps(chunk) + '\n')
-                    total_chunks += 1
+                f.write(''.join(result['lines']).encode('utf-8'))
+                total_chunks += len(result['lines'])
                 
                 # Track results
                 chunk_count = result['item1_chunks'] + result['item1a_chunks']
-                print(f"[{i}/{len(json_files)}] {data['ticker']}: {chunk_count} chunks")
+                print(f"[{i}/{len(json_files)}] {result['ticker']}: {chunk_count} chunks")
                 
                 if result['errors']:
                     errors.append({
-                        'ticker': data['ticker'],
+                        'ticker': result['ticker'],
                         'file': json_file,
                         'errors': result['errors']
                     })
                 else:
                     successful += 1
-                    
-            except Exception as e:
-                print(f"[{i}/{len(json_files)}] {Path(json_file).stem}: FAILED - {str(e)}")
-                errors.append({
-                    'file': json_file,
-                    'error': str(e)
-                })
+                
+                # Recorded even with section errors: its chunks are in the output,
+                # so the manifest and delta must account for them
+                new_files[name] = {
+                    'ticker': result['ticker'],
+                    'sha256': file_hashes[json_file],
+                    'offset': offset,
+                    'length': f.tell() - offset,
+                    'chunks': result['chunk_hashes'],
+                    'errors': result['errors']
+                }
+    finally:
+        if previous:
+            previous.close()
+        if pool:
+            pool.close()
+            pool.join()
+    
+    tmp_output.replace(OUTPUT_FILE)
+    delta = write_delta(manifest['files'], new_files)
+    tmp_manifest = MANIFEST_FILE.with_suffix('.json.tmp')
+    with open(tmp_manifest, 'w') as f:
+        json.dump({'params': chunking_params(strategy), 'files': new_files}, f)
+    tmp_manifest.replace(MANIFEST_FILE)
     
     # Print summary
     print(f"\n{'='*60}")
@@ -222,7 +454,9 @@ def process_all_files():
     print(f"Successful: {successful}/{len(json_files)}")
     print(f"Total chunks: {total_chunks}")
     print(f"Failed: {len(errors)}")
+    print(f"Delta: +{len(delta['added'])} added, ~{len(delta['changed'])} changed, -{len(delta['removed'])} removed")
     print(f"\nOutput: {OUTPUT_FILE}")
+    print(f"Delta file: {DELTA_FILE}")
     
     # Save error log if any errors
     if errors:
@@ -234,12 +468,18 @@ def process_all_files():
 
 
 def main():
+    parser = argparse.ArgumentParser(description="10-K chunking")
+    parser.add_argument("--workers", type=int, default=1, help="Processes chunking companies in parallel")
+    parser.add_argument("--strategy", choices=sorted(CHUNK_STRATEGIES), default="paragraph", help="Chunking strategy")
+    parser.add_argument("--incremental", action="store_true", help="Only re-chunk files changed since the last run")
+    args = parser.parse_args()
+    
     print(f"Max tokens per chunk: {MAX_TOKENS}")
     print(f"Overlap tokens: {OVERLAP_TOKENS}")
     print(f"Input directory: {INPUT_DIR}\n")
     
     start_time = datetime.now()
-    process_all_files()
+    process_all_files(workers=args.workers, strategy=args.strategy, incremental=args.incremental)
     elapsed = (datetime.now() - start_time).total_seconds()
     
     print(f"Total time: {elapsed:.1f} seconds\n")
@@ -4,27 +4,41 @@ Embeds 10-K chunks using Voyage Finance-2 and ingests into Qdrant Cloud.
 
 Key features:
 - Batch processing with rate limiting
+- Concurrent embedding and upsert stages
 - Resume capability (skips already embedded chunks)
+- Content-addressed embedding store (unchanged text is never re-embedded)
 - Cost tracking
 - Proper metadata indexing
 - Error handling with retries
 """
 
 import os
+import sys
 import json
 import time
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+import sqlite3
+import threading
+from queue import Queue
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from dataclasses import dataclass, replace
 import voyageai
+from voyageai.error import InvalidRequestError, RateLimitError
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
-    PayloadSchemaType, TextIndexParams, TextIndexType
+    PayloadSchemaType, TextIndexParams, TextIndexType,
+    HnswConfigDiff, CollectionStatus,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
 )
 from tqdm import tqdm
 import hashlib
+import numpy as np
 from pathlib import Path
 
+# Single copy of the rate limiter, shipped in the Lambda bundle
+sys.path.append(str(Path(__file__).resolve().parent.parent / "lambda"))
+from rate_limiter import RateLimiter, retry_after_seconds
+
 from dotenv import load_dotenv
 load_dotenv('../.env')  # Load from parent directory
 
@@ -46,18 +60,37 @@ class Config:
     VOYAGE_INPUT_TYPE: str = "document"  # "document" for corpus, "query" for user queries
     EMBEDDING_DIM: int = 1024  # voyage-finance-2 dimension
     BATCH_SIZE: int = 128  # Voyage supports up to 128 per batch
+    MAX_BATCH_TOKENS: int = 100_000  # Voyage caps finance-2 at 120K per request; token_count is a cl100k estimate
     
     # Qdrant settings
-    COLLECTION_NAME: str = "pocketstox_10k"
+    # Must be the collection the Lambda searches: both sides read COLLECTION_ALIAS, so
+    # version markers and --blue-green alias swaps land where traffic is served
+    COLLECTION_NAME: str = os.getenv("COLLECTION_ALIAS", "pocketstox-embeddings")
+    META_COLLECTION_NAME: str = "pocketstox-meta"  # Version markers read by the Lambda result cache
     DISTANCE_METRIC: Distance = Distance.COSINE
     
     # Rate limiting (Voyage: 300 RPM, 7M TPM for Tier 1)
     REQUESTS_PER_MINUTE: int = 280  # Leave buffer
+    TOKENS_PER_MINUTE: int = 6_000_000  # Leave buffer
+    
+    # Pipeline concurrency
+    EMBED_WORKERS: int = 4  # Concurrent Voyage requests
+    UPSERT_WORKERS: int = 2  # Concurrent Qdrant upserts
+    QUEUE_BATCHES: int = 8  # Batches buffered between stages
+    
+    # Bulk load (default with --recreate): upload_points with wait=False
+    BULK_UPLOAD_BATCH_SIZE: int = 256  # Points per upload request
+    BULK_DISABLE_INDEXING: bool = True  # Build the HNSW graph once after loading (new collections only)
+    
+    # Blue/green rebuilds
+    KEEP_COLLECTION_VERSIONS: int = 2  # Live version plus one to roll back to
+    SMOKE_QUERIES: int = 5  # Sampled points that must find themselves before the alias swap
     
     # Files
     INPUT_JSONL: str = "/Users/andres/Documents/Projects/Pocketstox/Extension/data/10k_chunks.jsonl"
     CHECKPOINT_FILE: str = "/Users/andres/Documents/Projects/Pocketstox/Extension/data/embedding_checkpoint.json"
     COST_LOG_FILE: str = "/Users/andres/Documents/Projects/Pocketstox/Extension/data/embedding_costs.json"
+    EMBEDDING_STORE_FILE: str = "/Users/andres/Documents/Projects/Pocketstox/Extension/data/embedding_store.sqlite"  # "" disables
     
     def validate(self):
         """Validate configuration"""
@@ -74,39 +107,151 @@ class Config:
 # ========================
 
 class CheckpointManager:
-    """Manages resume capability by tracking processed chunks"""
+    """
+    Manages resume capability by tracking processed chunks
+    
+    State is a compacted JSON snapshot (checkpoint_file) plus an append-only
+    log (checkpoint_file + '.log', one chunk_id per line). save() appends only
+    the ids marked since the last save and fsyncs, so it costs O(batch) and
+    can run after every batch; a torn final line from a crash is truncated
+    away on load. compact() folds the log into the snapshot with an atomic replace
+    and is run when the pipeline exits.
+    """
     
     def __init__(self, checkpoint_file: str):
         self.checkpoint_file = checkpoint_file
+        self.log_file = checkpoint_file + '.log'
         self.processed_ids = set()
+        self._unsaved = []
+        self._lock = threading.Lock()
         self._load()
     
     def _load(self):
-        """Load checkpoint from disk"""
+        """Load checkpoint from disk: snapshot, then replay the log"""
         if os.path.exists(self.checkpoint_file):
             with open(self.checkpoint_file, 'r') as f:
                 data = json.load(f)
                 self.processed_ids = set(data.get('processed_ids', []))
+        
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'rb+') as f:
+                data = f.read()
+                complete = data.rfind(b'\n') + 1
+                if complete < len(data):
+                    # Drop a torn final line from a crash, so the next append starts a fresh line
+                    f.truncate(complete)
+            self.processed_ids.update(line for line in data[:complete].decode().split('\n') if line)
+        
+        if self.processed_ids:
             print(f"📋 Loaded checkpoint: {len(self.processed_ids)} chunks already processed")
     
     def mark_processed(self, chunk_ids: List[str]):
         """Mark chunks as processed"""
-        self.processed_ids.update(chunk_ids)
+        with self._lock:
+            self.processed_ids.update(chunk_ids)
+            self._unsaved.extend(chunk_ids)
     
     def save(self):
-        """Save checkpoint to disk"""
-        os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump({
-                'processed_ids': list(self.processed_ids),
-                'last_updated': time.strftime('%Y-%m-%d %H:%M:%S')
-            }, f, indent=2)
+        """Append ids marked since the last save to the log and fsync"""
+        with self._lock:
+            if not self._unsaved:
+                return
+            os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+            with open(self.log_file, 'a') as f:
+                f.write(''.join(chunk_id + '\n' for chunk_id in self._unsaved))
+                f.flush()
+                os.fsync(f.fileno())
+            self._unsaved = []
+    
+    def compact(self):
+        """Rewrite the snapshot with every processed id and truncate the log"""
+        self.save()
+        with self._lock:
+            os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+            tmp_file = self.checkpoint_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump({
+                    'processed_ids': list(self.processed_ids),
+                    'last_updated': time.strftime('%Y-%m-%d %H:%M:%S')
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.checkpoint_file)
+            # A crash before this point only leaves ids duplicated in the log
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
     
     def is_processed(self, chunk_id: str) -> bool:
         """Check if chunk already processed"""
         return chunk_id in self.processed_ids
 
 
+# ========================
+# EMBEDDING STORE
+# ========================
+
+def text_hash(text: str) -> str:
+    """sha256 of chunk text, the same digest chunking.py writes as content_hash"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Content-addressed embeddings keyed by (model, text hash) in SQLite, so
+    text that reappears under a new chunk_id (a new filing with unchanged risk
+    factors, re-chunking) is not embedded again
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+    
+    def _select(self, columns: str, model: str, hashes: List[str]) -> List[Tuple]:
+        placeholders = ','.join('?' * len(hashes))
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT {columns} FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *hashes]
+            ).fetchall()
+    
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Stored vectors for the given hashes; missing hashes are absent"""
+        if not hashes:
+            return {}
+        rows = self._select("text_hash, vector", model, hashes)
+        return {h: np.frombuffer(blob, dtype=np.float32).tolist() for h, blob in rows}
+    
+    def contains_many(self, model: str, hashes: List[str]) -> set:
+        """Hashes that have a stored vector, without loading the vectors"""
+        if not hashes:
+            return set()
+        return {h for (h,) in self._select("text_hash", model, hashes)}
+    
+    def put_many(self, model: str, items: List[Tuple[str, List[float]]]):
+        """Store (hash, vector) pairs as float32"""
+        rows = [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in items]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
 # ========================
 # COST TRACKER
 # ========================
@@ -121,6 +266,7 @@ class CostTracker:
         self.cost_log_file = cost_log_file
         self.total_tokens = 0
         self.total_cost = 0.0
+        self._lock = threading.Lock()
         self._load()
     
     def _load(self):
@@ -133,8 +279,9 @@ class CostTracker:
     
     def add_usage(self, tokens: int):
         """Add token usage"""
-        self.total_tokens += tokens
-        self.total_cost = (self.total_tokens / 1_000_000) * self.COST_PER_1M_TOKENS
+        with self._lock:
+            self.total_tokens += tokens
+            self.total_cost = (self.total_tokens / 1_000_000) * self.COST_PER_1M_TOKENS
     
     def save(self):
         """Save cost log to disk"""
@@ -164,36 +311,43 @@ class EmbeddingPipeline:
         self.voyage_client = voyageai.Client(api_key=config.VOYAGE_API_KEY)
         self.checkpoint = CheckpointManager(config.CHECKPOINT_FILE)
         self.cost_tracker = CostTracker(config.COST_LOG_FILE)
-        self.request_times = []
+        self._stats_lock = threading.Lock()  # Counters updated by embed workers
+        self.rate_limiter = RateLimiter(
+            max_requests=config.REQUESTS_PER_MINUTE,
+            max_tokens=config.TOKENS_PER_MINUTE,
+            period=60
+        )
+        self.split_count = 0  # Batches split after exceeding the request token limit
+        self.store = EmbeddingStore(config.EMBEDDING_STORE_FILE) if config.EMBEDDING_STORE_FILE else None
+        self.store_hits = 0
     
-    def _rate_limit(self):
-        """Enforce rate limiting"""
-        now = time.time()
-        # Remove requests older than 1 minute
-        self.request_times = [t for t in self.request_times if now - t < 60]
-        
-        if len(self.request_times) >= self.config.REQUESTS_PER_MINUTE:
-            sleep_time = 60 - (now - self.request_times[0])
-            if sleep_time > 0:
-                print(f"⏳ Rate limit: sleeping {sleep_time:.1f}s")
-                time.sleep(sleep_time)
-        
-        self.request_times.append(time.time())
+    def _rate_limit(self, tokens: int = 0):
+        """Enforce rate limiting (RPM and TPM); safe to call from several threads"""
+        waited = self.rate_limiter.acquire(tokens)
+        if waited >= 1:
+            print(f"⏳ Rate limit: waited {waited:.1f}s")
     
-    def embed_batch(self, texts: List[str], retry_count: int = 3) -> Optional[List[List[float]]]:
+    def embed_batch(self, texts: List[str], retry_count: int = 3,
+                    token_counts: Optional[List[int]] = None) -> Optional[List[List[float]]]:
         """
         Embed a batch of texts using Voyage AI
         
+        A batch rejected for exceeding the per-request token limit is split in
+        half and each half embedded separately.
+        
         Args:
             texts: List of text strings to embed
             retry_count: Number of retries on failure
+            token_counts: Estimated tokens per text, counted against the TPM budget
         
         Returns:
             List of embeddings or None on failure
         """
-        self._rate_limit()
+        token_counts = token_counts or [0] * len(texts)
         
         for attempt in range(retry_count):
+            # Every attempt is a request against the RPM/TPM budget
+            self._rate_limit(sum(token_counts))
             try:
                 result = self.voyage_client.embed(
                     texts=texts,
@@ -208,16 +362,81 @@ class EmbeddingPipeline:
                 return result.embeddings
                 
             except Exception as e:
+                if len(texts) > 1 and self._is_token_limit_error(e):
+                    return self._embed_split(texts, retry_count, token_counts)
+                
+                retry_after = retry_after_seconds(e) if isinstance(e, RateLimitError) else None
+                if retry_after is not None:
+                    # Hold back every worker sharing the limiter, not just this one
+                    self.rate_limiter.backoff(retry_after)
+                
                 if attempt < retry_count - 1:
-                    wait_time = 2 ** attempt  # Exponential backoff
                     print(f"⚠️  Embedding failed (attempt {attempt+1}/{retry_count}): {e}")
-                    print(f"   Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+                    if retry_after is not None:
+                        print(f"   Retrying after server Retry-After of {retry_after:.1f}s...")
+                    else:
+                        wait_time = 2 ** attempt  # Exponential backoff
+                        print(f"   Retrying in {wait_time}s...")
+                        time.sleep(wait_time)
                 else:
                     print(f"❌ Embedding failed after {retry_count} attempts: {e}")
                     return None
         
         return None
+    
+    def embed_chunks(self, chunks: List[Dict]) -> Optional[List[List[float]]]:
+        """
+        Embed chunks, reusing vectors from the embedding store for text it has
+        already seen and sending only the rest to Voyage
+        
+        Returns:
+            One embedding per chunk, or None on failure
+        """
+        if self.store is None:
+            return self.embed_batch(
+                [c['text'] for c in chunks],
+                token_counts=[c['token_count'] for c in chunks]
+            )
+        
+        hashes = [c.get('content_hash') or text_hash(c['text']) for c in chunks]
+        stored = self.store.get_many(self.config.VOYAGE_MODEL, hashes)
+        missing = [i for i, h in enumerate(hashes) if h not in stored]
+        
+        if missing:
+            embedded = self.embed_batch(
+                [chunks[i]['text'] for i in missing],
+                token_counts=[chunks[i]['token_count'] for i in missing]
+            )
+            if embedded is None:
+                return None
+            new = {hashes[i]: emb for i, emb in zip(missing, embedded)}
+            self.store.put_many(self.config.VOYAGE_MODEL, list(new.items()))
+            stored.update(new)
+        
+        with self._stats_lock:
+            self.store_hits += len(chunks) - len(missing)
+        return [stored[h] for h in hashes]
+    
+    @staticmethod
+    def _is_token_limit_error(error: Exception) -> bool:
+        """Voyage rejects over-limit batches with a 400 mentioning the token cap"""
+        return isinstance(error, InvalidRequestError) and 'tokens' in str(error).lower()
+    
+    def _embed_split(self, texts: List[str], retry_count: int,
+                     token_counts: List[int]) -> Optional[List[List[float]]]:
+        """Embed the two halves of an over-limit batch"""
+        mid = len(texts) // 2
+        with self._stats_lock:
+            self.split_count += 1
+        print(f"✂️  Batch over token limit, splitting {len(texts)} → {mid} + {len(texts) - mid}")
+        
+        first = self.embed_batch(texts[:mid], retry_count, token_counts[:mid])
+        if first is None:
+            return None
+        second = self.embed_batch(texts[mid:], retry_count, token_counts[mid:])
+        if second is None:
+            return None
+        return first + second
 
 
 # ========================
@@ -239,11 +458,25 @@ class QdrantManager:
         """
         Create Qdrant collection with optimal schema
         
+        An alias (after a --blue-green rebuild) counts as an existing
+        collection. It cannot be recreated in place: deleting the alias name
+        would leave the collection behind it untouched.
+        
         Args:
             recreate: If True, delete existing collection first
+        
+        Raises:
+            ValueError: if recreate is requested for an alias
         """
         collection_name = self.config.COLLECTION_NAME
         
+        target = self.alias_target(collection_name)
+        if target is not None:
+            if recreate:
+                raise ValueError(f"{collection_name} is an alias onto {target}; rebuild it with --blue-green instead of --recreate")
+            print(f"✅ Collection already exists: {collection_name} (alias → {target})")
+            return
+        
         # Check if collection exists
         collections = self.client.get_collections().collections
         exists = any(c.name == collection_name for c in collections)
@@ -305,6 +538,61 @@ class QdrantManager:
         else:
             print(f"✅ Collection already exists: {collection_name}")
     
+    def bump_collection_version(self, collection_name: Optional[str] = None) -> int:
+        """
+        Increment the collection's version marker so the Lambda drops cached
+        search results computed against the previous contents
+        
+        Args:
+            collection_name: Collection or alias the Lambda searches (default: config)
+        
+        Returns:
+            The new version number
+        """
+        meta_name = self.config.META_COLLECTION_NAME
+        collection_name = collection_name or self.config.COLLECTION_NAME
+        
+        collections = self.client.get_collections().collections
+        if not any(c.name == meta_name for c in collections):
+            self.client.create_collection(collection_name=meta_name, vectors_config={})
+        
+        marker_id = version_marker_id(collection_name)
+        records = self.client.retrieve(collection_name=meta_name, ids=[marker_id], with_payload=True)
+        version = (records[0].payload.get('version', 0) if records else 0) + 1
+        
+        self.client.upsert(
+            collection_name=meta_name,
+            points=[PointStruct(
+                id=marker_id,
+                vector={},
+                payload={
+                    'collection': collection_name,
+                    'version': version,
+                    'updated_at': time.strftime('%Y-%m-%d %H:%M:%S')
+                }
+            )]
+        )
+        print(f"🔖 Collection version bumped: {collection_name} → v{version}")
+        return version
+    
+    def alias_target(self, alias: str) -> Optional[str]:
+        """Collection an alias currently points to, or None"""
+        for description in self.client.get_aliases().aliases:
+            if description.alias_name == alias:
+                return description.collection_name
+        return None
+    
+    def swap_alias(self, alias: str, collection_name: str):
+        """Point alias at collection_name in one atomic aliases update"""
+        operations = []
+        if self.alias_target(alias) is not None:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias)))
+        operations.append(CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=collection_name, alias_name=alias)
+        ))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"🔀 Alias {alias} → {collection_name}")
+    
     def upsert_points(self, points: List[PointStruct], batch_size: int = 50):
         """
         Upsert points to Qdrant in batches
@@ -325,19 +613,156 @@ class QdrantManager:
             except Exception as e:
                 print(f"❌ Upsert failed for batch {i//batch_size + 1}: {e}")
                 raise
+    
+    def upload_points(self, points: List[PointStruct]):
+        """
+        Bulk path: send points with upload_points and wait=False, so Qdrant
+        acknowledges once the update is in its WAL rather than applied.
+        Parallelism comes from the pipeline's concurrent upsert workers;
+        call consistency_barrier once all uploads are done.
+        
+        Args:
+            points: List of PointStruct objects
+        """
+        self.client.upload_points(
+            collection_name=self.config.COLLECTION_NAME,
+            points=points,
+            batch_size=self.config.BULK_UPLOAD_BATCH_SIZE,
+            max_retries=3,
+            wait=False
+        )
+    
+    def consistency_barrier(self, points: List[PointStruct]):
+        """
+        Re-upsert a batch that was already uploaded (idempotent) with
+        wait=True. Updates are applied in order, so when this returns every
+        earlier wait=False upload has been applied too.
+        
+        Args:
+            points: Any batch from the finished load, normally the last one
+        """
+        self.client.upsert(
+            collection_name=self.config.COLLECTION_NAME,
+            points=points,
+            wait=True
+        )
+        count = self.client.count(collection_name=self.config.COLLECTION_NAME, exact=True).count
+        print(f"✅ Bulk load applied: {count:,} points in {self.config.COLLECTION_NAME}")
+    
+    def disable_indexing(self) -> Optional[int]:
+        """
+        Stop HNSW graph construction (m=0) for the duration of a bulk load
+        
+        Returns:
+            The previous m, to pass to enable_indexing
+        """
+        info = self.client.get_collection(self.config.COLLECTION_NAME)
+        previous_m = info.config.hnsw_config.m
+        self.client.update_collection(
+            collection_name=self.config.COLLECTION_NAME,
+            hnsw_config=HnswConfigDiff(m=0)
+        )
+        print(f"⏸️  HNSW indexing disabled for bulk load (was m={previous_m})")
+        return previous_m
+    
+    def enable_indexing(self, m: Optional[int], timeout: int = 3600, poll_seconds: int = 5):
+        """
+        Restore HNSW indexing after a bulk load and wait for the graph build
+        
+        Args:
+            m: HNSW m to restore (from disable_indexing)
+            timeout: Seconds to wait for the collection to turn green
+            poll_seconds: Seconds between status checks
+        """
+        self.client.update_collection(
+            collection_name=self.config.COLLECTION_NAME,
+            hnsw_config=HnswConfigDiff(m=m or 16)
+        )
+        print(f"▶️  HNSW indexing re-enabled (m={m or 16}), waiting for the index build...")
+        
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            status = self.client.get_collection(self.config.COLLECTION_NAME).status
+            if status == CollectionStatus.GREEN:
+                print("✅ Index build complete")
+                return
+            time.sleep(poll_seconds)
+        print(f"⚠️  Collection still {status} after {timeout}s; searches work but may be slower until indexing finishes")
 
 
 # ========================
 # MAIN PIPELINE
 # ========================
 
-def load_chunks(jsonl_file: str) -> List[Dict]:
-    """Load chunks from JSONL file"""
-    chunks = []
+def load_chunks(jsonl_file: str) -> Iterator[Dict]:
+    """Stream chunks from JSONL file one line at a time"""
     with open(jsonl_file, 'r') as f:
         for line in f:
-            chunks.append(json.loads(line))
-    return chunks
+            if line.strip():
+                yield json.loads(line)
+
+
+def pending_chunks(jsonl_file: str, checkpoint: CheckpointManager) -> Iterator[Dict]:
+    """Stream chunks not yet recorded in the checkpoint"""
+    for chunk in load_chunks(jsonl_file):
+        if not checkpoint.is_processed(chunk['chunk_id']):
+            yield chunk
+
+
+def iter_token_batches(chunks: Iterable[Dict], max_items: int,
+                       max_tokens: int) -> Iterator[List[Dict]]:
+    """
+    Pack a chunk stream into batches bounded by both item count and total
+    token_count, formed lazily in input order. A chunk larger than max_tokens
+    on its own is sent as a batch of one.
+    """
+    batch = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = chunk['token_count']
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def estimate_workload(jsonl_file: str, checkpoint: CheckpointManager,
+                      max_items: int, max_tokens: int,
+                      store: Optional[EmbeddingStore] = None, model: str = "") -> Dict:
+    """
+    Streaming pass over the input counting total and pending chunks, pending
+    tokens and embed batches, without holding more than one batch in memory.
+    Pending chunks whose text is already in the embedding store are counted
+    as 'stored' and their tokens left out of 'tokens'.
+    
+    Returns:
+        Dict with 'total', 'pending', 'stored', 'tokens' and 'batches'
+    """
+    workload = {'total': 0, 'pending': 0, 'stored': 0, 'tokens': 0, 'batches': 0}
+    
+    def pending():
+        for chunk in load_chunks(jsonl_file):
+            workload['total'] += 1
+            if not checkpoint.is_processed(chunk['chunk_id']):
+                yield chunk
+    
+    for batch in iter_token_batches(pending(), max_items, max_tokens):
+        workload['batches'] += 1
+        workload['pending'] += len(batch)
+        hashes = [c.get('content_hash') or text_hash(c['text']) for c in batch]
+        stored = store.contains_many(model, hashes) if store else set()
+        workload['stored'] += sum(h in stored for h in hashes)
+        workload['tokens'] += sum(c['token_count'] for c, h in zip(batch, hashes) if h not in stored)
+    return workload
+
+
+def version_marker_id(collection_name: str) -> int:
+    """Point id of a collection's version marker (must match the Lambda)"""
+    return int(hashlib.md5(collection_name.encode()).hexdigest(), 16) % (2**63)
 
 
 def chunk_to_point(chunk: Dict, embedding: List[float]) -> PointStruct:
@@ -372,11 +797,149 @@ def chunk_to_point(chunk: Dict, embedding: List[float]) -> PointStruct:
     )
 
 
+def run_ingest(
+    embedder: EmbeddingPipeline,
+    qdrant: QdrantManager,
+    batches: Iterable[List[Dict]],
+    embed_workers: int,
+    upsert_workers: int,
+    queue_batches: int,
+    progress: Optional[tqdm] = None,
+    bulk: bool = False
+) -> int:
+    """
+    Embed and upsert batches with overlapping stages:
+    reader → [embed queue] → embed workers → [upsert queue] → upsert workers
+    
+    Both queues are bounded, so the reader stays at most a few batches ahead.
+    Chunks are marked in the checkpoint only after their upsert succeeds. On
+    the first embed or upsert failure, reading stops; batches already embedded
+    are still upserted, later ones are dropped for the next run to resume.
+    An unexpected exception in any stage stops the pipeline the same way and
+    is re-raised here once every thread has finished.
+    
+    With bulk=True, upsert workers use QdrantManager.upload_points (wait=False)
+    and a consistency barrier runs after the last upload. Chunks are then
+    checkpointed once Qdrant has accepted them into its WAL.
+    
+    Returns:
+        Number of chunks uploaded
+    """
+    embed_queue = Queue(maxsize=queue_batches)
+    upsert_queue = Queue(maxsize=queue_batches)
+    stop = threading.Event()
+    lock = threading.Lock()
+    state = {'uploaded': 0, 'batches': 0, 'upsert_failed': False, 'last_points': None, 'error': None}
+    
+    def fail(error, where):
+        # Record the first unexpected error; workers keep draining so nothing blocks
+        print(f"❌ {where} failed: {error!r}, stopping pipeline")
+        with lock:
+            if state['error'] is None:
+                state['error'] = error
+            state['upsert_failed'] = True
+        stop.set()
+    
+    def reader():
+        try:
+            for batch_num, batch_chunks in enumerate(batches, 1):
+                if stop.is_set():
+                    break
+                embed_queue.put((batch_num, batch_chunks))
+        except Exception as e:
+            fail(e, "Reading chunks")
+        finally:
+            for _ in range(embed_workers):
+                embed_queue.put(None)
+    
+    def embed_worker():
+        # Keeps draining after a stop so the reader never blocks on a full queue
+        while (item := embed_queue.get()) is not None:
+            if stop.is_set():
+                continue
+            batch_num, batch_chunks = item
+            try:
+                embeddings = embedder.embed_chunks(batch_chunks)
+                if embeddings is None:
+                    print(f"❌ Batch {batch_num} failed, stopping pipeline")
+                    stop.set()
+                    continue
+                points = [chunk_to_point(chunk, emb) for chunk, emb in zip(batch_chunks, embeddings)]
+            except Exception as e:
+                fail(e, f"Embedding batch {batch_num}")
+                continue
+            upsert_queue.put((batch_num, batch_chunks, points))
+    
+    def upsert_worker():
+        while (item := upsert_queue.get()) is not None:
+            batch_num, batch_chunks, points = item
+            if state['upsert_failed']:
+                continue
+            try:
+                if bulk:
+                    qdrant.upload_points(points)
+                else:
+                    qdrant.upsert_points(points, batch_size=50)
+            except Exception as e:
+                print(f"❌ Upsert failed for batch {batch_num}: {e}")
+                print("Stopping pipeline. Re-run to resume from checkpoint.")
+                state['upsert_failed'] = True
+                stop.set()
+                continue
+            
+            try:
+                # ✅ Only mark as processed AFTER successful upsert
+                embedder.checkpoint.mark_processed([c['chunk_id'] for c in batch_chunks])
+                
+                # Appending to the checkpoint log is cheap enough for every batch
+                embedder.checkpoint.save()
+                
+                with lock:
+                    state['uploaded'] += len(points)
+                    state['batches'] += 1
+                    state['last_points'] = points
+                    save_costs = state['batches'] % 10 == 0
+                    if progress is not None:
+                        progress.update(1)
+                
+                # Save cost log every 10 batches
+                if save_costs:
+                    embedder.cost_tracker.save()
+            except Exception as e:
+                fail(e, f"Checkpointing batch {batch_num}")
+    
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    embed_threads = [threading.Thread(target=embed_worker, daemon=True) for _ in range(embed_workers)]
+    upsert_threads = [threading.Thread(target=upsert_worker, daemon=True) for _ in range(upsert_workers)]
+    for thread in [reader_thread, *embed_threads, *upsert_threads]:
+        thread.start()
+    
+    reader_thread.join()
+    for thread in embed_threads:
+        thread.join()
+    for _ in range(upsert_workers):
+        upsert_queue.put(None)
+    for thread in upsert_threads:
+        thread.join()
+    
+    if state['error'] is not None:
+        raise state['error']
+    
+    if bulk and state['last_points']:
+        qdrant.consistency_barrier(state['last_points'])
+    
+    return state['uploaded']
+
+
 def run_pipeline(
     config: Config,
     recreate_collection: bool = False,
-    dry_run: bool = False
-):
+    dry_run: bool = False,
+    embed_workers: Optional[int] = None,
+    upsert_workers: Optional[int] = None,
+    bulk: Optional[bool] = None,
+    bump_version: bool = True
+) -> Optional[Dict]:
     """
     Main pipeline execution
     
@@ -384,6 +947,15 @@ def run_pipeline(
         config: Pipeline configuration
         recreate_collection: Whether to recreate Qdrant collection
         dry_run: If True, only estimate costs without embedding
+        embed_workers: Concurrent embedding requests (default: config.EMBED_WORKERS)
+        upsert_workers: Concurrent upserts (default: config.UPSERT_WORKERS)
+        bulk: Bulk-load mode with wait=False uploads (default: on with recreate_collection);
+            HNSW indexing is only paused when the collection is recreated too
+        bump_version: Bump the collection's version marker when done
+    
+    Returns:
+        Dict with 'total', 'pending' and 'uploaded' chunk counts, or None if
+        nothing was ingested (dry run or cancelled)
     """
     config.validate()
     
@@ -391,44 +963,49 @@ def run_pipeline(
     print("🚀 POCKETSTOX EMBEDDING & INGESTION PIPELINE")
     print("="*70)
     
-    # Load chunks
-    print(f"\n📂 Loading chunks from: {config.INPUT_JSONL}")
-    chunks = load_chunks(config.INPUT_JSONL)
-    print(f"   Loaded {len(chunks):,} chunks")
-    
     # Initialize components
     embedder = EmbeddingPipeline(config)
     qdrant = QdrantManager(config)
     
-    # Filter already processed chunks
-    chunks_to_process = [
-        c for c in chunks 
-        if not embedder.checkpoint.is_processed(c['chunk_id'])
-    ]
+    if recreate_collection and not dry_run and (target := qdrant.alias_target(config.COLLECTION_NAME)):
+        print(f"❌ {config.COLLECTION_NAME} is an alias onto {target} (from a --blue-green rebuild).")
+        print("   --recreate cannot replace it in place; rebuild with --blue-green instead.")
+        return None
     
-    if len(chunks_to_process) < len(chunks):
-        print(f"   ✅ Skipping {len(chunks) - len(chunks_to_process):,} already processed chunks")
+    # Count work in a separate streaming pass; chunks are re-read lazily below
+    print(f"\n📂 Scanning chunks in: {config.INPUT_JSONL}")
+    workload = estimate_workload(
+        config.INPUT_JSONL, embedder.checkpoint,
+        max_items=config.BATCH_SIZE, max_tokens=config.MAX_BATCH_TOKENS,
+        store=embedder.store, model=config.VOYAGE_MODEL
+    )
+    print(f"   Found {workload['total']:,} chunks")
+    
+    if workload['pending'] < workload['total']:
+        print(f"   ✅ Skipping {workload['total'] - workload['pending']:,} already processed chunks")
     
-    print(f"   📊 Chunks to process: {len(chunks_to_process):,}")
+    print(f"   📊 Chunks to process: {workload['pending']:,}")
+    if workload['stored']:
+        print(f"   ♻️  Already in embedding store: {workload['stored']:,} (not re-embedded)")
     
     # Estimate costs
-    total_tokens = sum(c['token_count'] for c in chunks_to_process)
-    estimated_cost = (total_tokens / 1_000_000) * CostTracker.COST_PER_1M_TOKENS
+    estimated_cost = (workload['tokens'] / 1_000_000) * CostTracker.COST_PER_1M_TOKENS
+    num_batches = workload['batches']
     print(f"\n💰 Cost Estimate:")
-    print(f"   Tokens: {total_tokens:,}")
+    print(f"   Tokens: {workload['tokens']:,}")
     print(f"   Cost: ${estimated_cost:.4f}")
-    print(f"   Batches: {len(chunks_to_process) // config.BATCH_SIZE + 1}")
+    print(f"   Batches: {num_batches}")
     
     if dry_run:
         print("\n🔍 Dry run complete. Set dry_run=False to proceed.")
-        return
+        return None
     
     # Confirm
     print("\n" + "="*70)
     response = input("🚦 Proceed with embedding and ingestion? (yes/no): ")
     if response.lower() != 'yes':
         print("❌ Cancelled.")
-        return
+        return None
     
     # Create/verify collection
     print("\n" + "="*70)
@@ -439,61 +1016,296 @@ def run_pipeline(
     print("🔄 PROCESSING BATCHES")
     print("="*70)
     
-    batch_size = config.BATCH_SIZE
-    total_uploaded = 0
+    embed_workers = embed_workers or config.EMBED_WORKERS
+    upsert_workers = upsert_workers or config.UPSERT_WORKERS
+    bulk = recreate_collection if bulk is None else bulk
+    print(f"Workers: {embed_workers} embed, {upsert_workers} upsert{' (bulk load)' if bulk else ''}")
     
-    # ✅ CRITICAL FIX: Upload batch-by-batch, not all at once!
-    for i in tqdm(range(0, len(chunks_to_process), batch_size), desc="Embedding & Upload", unit="batch"):
-        batch_chunks = chunks_to_process[i:i+batch_size]
-        
-        # Extract texts
-        texts = [c['text'] for c in batch_chunks]
-        
-        # Embed batch
-        embeddings = embedder.embed_batch(texts)
-        
-        if embeddings is None:
-            print(f"❌ Batch {i//batch_size + 1} failed, stopping pipeline")
-            break
-        
-        # Convert to points
-        batch_points = [
-            chunk_to_point(chunk, emb)
-            for chunk, emb in zip(batch_chunks, embeddings)
-        ]
-        
-        # ✅ UPSERT IMMEDIATELY (don't accumulate!)
-        try:
-            qdrant.upsert_points(batch_points, batch_size=50)
-            total_uploaded += len(batch_points)
-            
-            # ✅ Only mark as processed AFTER successful upsert
-            chunk_ids = [c['chunk_id'] for c in batch_chunks]
-            embedder.checkpoint.mark_processed(chunk_ids)
-            
-        except Exception as e:
-            print(f"❌ Upsert failed for batch {i//batch_size + 1}: {e}")
-            print("Stopping pipeline. Re-run to resume from checkpoint.")
-            break
-        
-        # Save checkpoint every 10 batches
-        if (i // batch_size + 1) % 10 == 0:
-            embedder.checkpoint.save()
-            embedder.cost_tracker.save()
+    # Chunks are streamed from disk and batched lazily, so memory stays flat
+    # regardless of input size
+    batches = iter_token_batches(
+        pending_chunks(config.INPUT_JSONL, embedder.checkpoint),
+        max_items=config.BATCH_SIZE, max_tokens=config.MAX_BATCH_TOKENS
+    )
+    
+    tokens_before = embedder.cost_tracker.total_tokens
+    # HNSW is only paused on a collection created by this run (--recreate or a
+    # blue/green version); on a live collection it would turn searches into full scans
+    pause_indexing = bulk and config.BULK_DISABLE_INDEXING and recreate_collection
+    hnsw_m = qdrant.disable_indexing() if pause_indexing else None
+    
+    start_time = time.time()
+    try:
+        with tqdm(total=num_batches, desc="Embedding & Upload", unit="batch") as progress:
+            total_uploaded = run_ingest(
+                embedder, qdrant, batches,
+                embed_workers=embed_workers,
+                upsert_workers=upsert_workers,
+                queue_batches=config.QUEUE_BATCHES,
+                progress=progress,
+                bulk=bulk
+            )
+    finally:
+        # Final saves, also on Ctrl-C: fold the checkpoint log into the snapshot
+        embedder.checkpoint.compact()
+        embedder.cost_tracker.save()
+        if pause_indexing:
+            qdrant.enable_indexing(hnsw_m)
+    elapsed = time.time() - start_time
     
-    # Final saves
-    embedder.checkpoint.save()
-    embedder.cost_tracker.save()
+    # Invalidate cached search results in the Lambda
+    if bump_version and (total_uploaded or recreate_collection):
+        qdrant.bump_collection_version()
     
     # Final summary
     print("\n" + "="*70)
     print("✅ PIPELINE COMPLETE")
     print("="*70)
-    print(f"Processed: {total_uploaded:,} chunks")
+    print(f"Processed: {total_uploaded:,} chunks in {elapsed:.1f}s")
+    tokens_per_minute = (embedder.cost_tracker.total_tokens - tokens_before) / max(elapsed / 60, 1e-9)
+    print(f"Throughput: {tokens_per_minute:,.0f} tokens/min "
+          f"({tokens_per_minute / config.TOKENS_PER_MINUTE:.0%} of {config.TOKENS_PER_MINUTE:,} TPM budget)")
+    if embedder.store is not None:
+        print(f"Reused from embedding store: {embedder.store_hits:,} chunks")
+    if embedder.split_count:
+        print(f"Over-limit batches split: {embedder.split_count}")
     print(f"Cost: {embedder.cost_tracker.get_summary()}")
     print(f"Collection: {config.COLLECTION_NAME}")
     print(f"Checkpoint: {config.CHECKPOINT_FILE}")
     print("="*70)
+    
+    return {'total': workload['total'], 'pending': workload['pending'], 'uploaded': total_uploaded}
+
+
+# ========================
+# BLUE/GREEN REBUILD
+# ========================
+
+def smoke_test(qdrant: QdrantManager, collection_name: str, samples: int) -> bool:
+    """
+    Search a new collection with the stored vectors of a few of its points;
+    each must come back as its own top hit
+    """
+    points, _ = qdrant.client.scroll(
+        collection_name=collection_name, limit=samples, with_payload=False, with_vectors=True
+    )
+    for point in points:
+        hits = qdrant.client.search(
+            collection_name=collection_name, query_vector=point.vector, limit=1, with_payload=False
+        )
+        if not hits or (hits[0].id != point.id and hits[0].score < 0.9999):
+            print(f"❌ Smoke query for point {point.id} returned {hits[0].id if hits else 'nothing'}")
+            return False
+    print(f"✅ Smoke queries passed: {len(points)}")
+    return bool(points)
+
+
+def collect_old_versions(qdrant: QdrantManager, alias: str, keep: int):
+    """Delete versioned collections of an alias beyond the newest `keep`; never the live one"""
+    live = qdrant.alias_target(alias)
+    versions = sorted(
+        (c.name for c in qdrant.client.get_collections().collections if c.name.startswith(f"{alias}_v")),
+        reverse=True  # Version suffixes are timestamps, so names sort by age
+    )
+    for name in versions[keep:]:
+        if name != live:
+            qdrant.client.delete_collection(name)
+            print(f"🗑️  Deleted old version: {name}")
+
+
+def rebuild_blue_green(config: Config, embed_workers: Optional[int] = None,
+                       upsert_workers: Optional[int] = None) -> bool:
+    """
+    Rebuild into a fresh versioned collection while the alias keeps serving
+    the current one, then swap the alias atomically
+    
+    config.COLLECTION_NAME is the alias the Lambda searches, so it must come
+    from COLLECTION_ALIAS set explicitly to the Lambda's value: the first
+    rebuild deletes a real collection under the alias name, and an alias the
+    Lambda does not search would never reach traffic. The new version
+    gets its own checkpoint file, so an earlier partial rebuild never leaks
+    in; the embedding store keeps re-embedding cheap. The alias only moves if
+    every chunk was ingested, the point count matches and the smoke queries
+    pass.
+    
+    Returns:
+        True if the alias now points at the new version
+    """
+    alias = config.COLLECTION_NAME
+    if os.getenv("COLLECTION_ALIAS") != alias:
+        print(f"❌ Refusing to rebuild {alias}: export COLLECTION_ALIAS with the value the Lambda is "
+              f"deployed with (currently {os.getenv('COLLECTION_ALIAS') or 'unset'})")
+        return False
+    version_name = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+    checkpoint_base, _ = os.path.splitext(config.CHECKPOINT_FILE)
+    version_config = replace(
+        config,
+        COLLECTION_NAME=version_name,
+        CHECKPOINT_FILE=f"{checkpoint_base}.{version_name}.json"
+    )
+    
+    print(f"🟦 Blue/green rebuild: {alias} (live: {QdrantManager(config).alias_target(alias) or 'none'}) → {version_name}")
+    result = run_pipeline(
+        version_config,
+        recreate_collection=True,
+        embed_workers=embed_workers,
+        upsert_workers=upsert_workers,
+        bump_version=False
+    )
+    if result is None or result['uploaded'] < result['pending']:
+        print(f"❌ Rebuild incomplete; alias {alias} left unchanged. {version_name} will be garbage-collected later.")
+        return False
+    
+    # Verify before switching traffic
+    qdrant = QdrantManager(version_config)
+    count = qdrant.client.count(collection_name=version_name, exact=True).count
+    if count != result['total']:
+        print(f"❌ Point count {count:,} != {result['total']:,} chunks; alias {alias} left unchanged")
+        return False
+    print(f"✅ Point count verified: {count:,}")
+    if not smoke_test(qdrant, version_name, config.SMOKE_QUERIES):
+        print(f"❌ Smoke queries failed; alias {alias} left unchanged")
+        return False
+    
+    # A pre-alias deployment has a real collection under the alias name; it
+    # must go before the alias can be created (a gap of one request)
+    if alias in (c.name for c in qdrant.client.get_collections().collections):
+        print(f"⚠️  Replacing legacy collection {alias} with an alias")
+        qdrant.client.delete_collection(alias)
+    
+    qdrant.swap_alias(alias, version_name)
+    qdrant.bump_collection_version(alias)
+    collect_old_versions(qdrant, alias, config.KEEP_COLLECTION_VERSIONS)
+    return True
+
+
+# ========================
+# SNAPSHOT EXPORT
+# ========================
+
+# Payload fields the Lambda returns in its matches schema (chunk text is left out)
+SNAPSHOT_FIELDS = [
+    'ticker', 'company_name', 'exchange', 'cik', 'section', 'subsection',
+    'filing_date', 'fiscal_year', 'industry', 'sic_code', 'chunk_id',
+]
+
+
+def quantize_snapshot(output_dir: str, block_rows: int = 8192):
+    """
+    Write an int8 copy of a snapshot's vectors with per-dimension scales
+    (vectors_int8.npy, scales.npy) for the Lambda's QuantizedIndex
+    
+    Args:
+        output_dir: Snapshot directory containing vectors.npy
+        block_rows: Rows processed at a time, bounds memory use
+    """
+    vectors = np.load(os.path.join(output_dir, 'vectors.npy'), mmap_mode='r')
+    
+    # Pass 1: symmetric per-dimension range
+    max_abs = np.zeros(vectors.shape[1], dtype=np.float32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.abs(vectors[start:start + block_rows].astype(np.float32))
+        np.maximum(max_abs, block.max(axis=0), out=max_abs)
+    scales = np.where(max_abs == 0, 1.0, max_abs / 127.0).astype(np.float32)
+    
+    # Pass 2: quantize
+    quantized = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'vectors_int8.npy'), mode='w+',
+        dtype=np.int8, shape=vectors.shape
+    )
+    for start in range(0, len(vectors), block_rows):
+        block = vectors[start:start + block_rows].astype(np.float32) / scales
+        quantized[start:start + len(block)] = np.clip(np.rint(block), -127, 127)
+    quantized.flush()
+    del quantized
+    
+    np.save(os.path.join(output_dir, 'scales.npy'), scales)
+    print(f"✅ Quantized snapshot written: {vectors.shape[0]:,} x {vectors.shape[1]} int8")
+
+
+def export_snapshot(config: Config, output_dir: str, dtype: str = "float16",
+                    quantize: bool = False, scroll_size: int = 1000):
+    """
+    Export the collection as a memory-mappable vector matrix plus a compact
+    payload table, loadable by lambda/local_index.py
+    
+    Args:
+        config: Pipeline configuration
+        output_dir: Snapshot directory (created if missing)
+        dtype: "float16" (half the size) or "float32"
+        quantize: Also write the int8 matrix used by QuantizedIndex
+        scroll_size: Points fetched per scroll request
+    """
+    if dtype not in ("float16", "float32"):
+        raise ValueError("dtype must be float16 or float32")
+    
+    qdrant = QdrantManager(config)
+    collection_name = config.COLLECTION_NAME
+    total = qdrant.client.count(collection_name=collection_name, exact=True).count
+    
+    print(f"📦 Exporting {total:,} points from {collection_name} to {output_dir} ({dtype})")
+    os.makedirs(output_dir, exist_ok=True)
+    
+    vectors = np.lib.format.open_memmap(
+        os.path.join(output_dir, 'vectors.npy'), mode='w+',
+        dtype=dtype, shape=(total, config.EMBEDDING_DIM)
+    )
+    ids = []
+    rows = []
+    offset = None
+    
+    with tqdm(total=total, desc="Export", unit="pt") as progress:
+        while len(ids) < total:
+            points, offset = qdrant.client.scroll(
+                collection_name=collection_name,
+                limit=scroll_size,
+                offset=offset,
+                with_payload=SNAPSHOT_FIELDS,
+                with_vectors=True
+            )
+            points = points[:total - len(ids)]
+            if not points:
+                break
+            
+            block = np.asarray([p.vector for p in points], dtype=np.float32)
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            block /= np.where(norms == 0, 1.0, norms)
+            vectors[len(ids):len(ids) + len(points)] = block
+            
+            for p in points:
+                ids.append(p.id)
+                rows.append([p.payload.get(field) for field in SNAPSHOT_FIELDS])
+            progress.update(len(points))
+            
+            if offset is None:
+                break
+    
+    vectors.flush()
+    del vectors
+    
+    if len(ids) < total:
+        # Collection shrank while scrolling: rewrite the matrix at the real size
+        full = np.load(os.path.join(output_dir, 'vectors.npy'))[:len(ids)]
+        np.save(os.path.join(output_dir, 'vectors.npy'), full)
+    
+    if quantize:
+        quantize_snapshot(output_dir)
+    
+    with open(os.path.join(output_dir, 'payloads.json'), 'w') as f:
+        json.dump({'fields': SNAPSHOT_FIELDS, 'ids': ids, 'rows': rows}, f, separators=(',', ':'))
+    
+    # Written last: the loader treats a directory without meta.json as incomplete
+    with open(os.path.join(output_dir, 'meta.json'), 'w') as f:
+        json.dump({
+            'collection': collection_name,
+            'count': len(ids),
+            'dim': config.EMBEDDING_DIM,
+            'dtype': dtype,
+            'quantized': quantize,
+            'exported_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }, f, indent=2)
+    
+    print(f"✅ Snapshot written: {len(ids):,} vectors")
 
 
 # ========================
@@ -506,7 +1318,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Pocketstox Embedding & Ingestion Pipeline")
     parser.add_argument("--input", type=str, help="Input JSONL file (default: from config)")
     parser.add_argument("--recreate", action="store_true", help="Recreate Qdrant collection")
+    parser.add_argument("--blue-green", action="store_true", help="Rebuild into a new versioned collection and swap the alias")
     parser.add_argument("--dry-run", action="store_true", help="Estimate costs without embedding")
+    parser.add_argument("--embed-workers", type=int, help="Concurrent embedding requests (default: from config)")
+    parser.add_argument("--upsert-workers", type=int, help="Concurrent Qdrant upserts (default: from config)")
+    parser.add_argument("--bulk", action=argparse.BooleanOptionalAction, default=None,
+                        help="Bulk-load with wait=False uploads, HNSW paused when recreating (default: on with --recreate)")
+    parser.add_argument("--export-snapshot", type=str, metavar="DIR", help="Export collection for the Lambda local index and exit")
+    parser.add_argument("--snapshot-dtype", choices=["float16", "float32"], default="float16", help="Snapshot vector precision")
+    parser.add_argument("--snapshot-quantize", action="store_true", help="Also write an int8 copy for the quantized local index")
     
     args = parser.parse_args()
     
@@ -515,9 +1335,22 @@ if __name__ == "__main__":
     if args.input:
         config.INPUT_JSONL = args.input
     
+    if args.export_snapshot:
+        config.validate()
+        export_snapshot(config, args.export_snapshot, dtype=args.snapshot_dtype, quantize=args.snapshot_quantize)
+        raise SystemExit(0)
+    
+    if args.blue_green:
+        config.validate()
+        ok = rebuild_blue_green(config, embed_workers=args.embed_workers, upsert_workers=args.upsert_workers)
+        raise SystemExit(0 if ok else 1)
+    
     # Run pipeline
     run_pipeline(
         config=config,
         recreate_collection=args.recreate,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        embed_workers=args.embed_workers,
+        upsert_workers=args.upsert_workers,
+        bulk=args.bulk
     )
\ No newline at end of file